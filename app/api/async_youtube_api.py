@@ -0,0 +1,139 @@
+import asyncio
+import os
+import httpx
+import requests
+from typing import List, Optional, Dict, Tuple
+from app.api.youtube_api import YouTubeAPI, parse_live_chat_items
+
+
+class AsyncYouTubeAPI:
+    """Asyncio-native YouTube Data API v3 client for live chat polling and live checks."""
+
+    VIDEOS_URL = YouTubeAPI.VIDEOS_URL
+    LIVECHAT_URL = YouTubeAPI.LIVECHAT_URL
+    CONNECT_TIMEOUT = YouTubeAPI.CONNECT_TIMEOUT
+    DEFAULT_TIMEOUTS = YouTubeAPI.DEFAULT_TIMEOUTS
+    RETRY_STATUS_CODES = YouTubeAPI.RETRY_STATUS_CODES
+
+    def __init__(
+        self,
+        api_key: str,
+        pool_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        timeouts: Optional[Dict[str, float]] = None
+    ):
+        """
+        Initialize async YouTube API client.
+
+        Args:
+            api_key: YouTube Data API v3 key
+            pool_size: Keep-alive connections (default: YOUTUBE_HTTP_POOL_SIZE or 10)
+            max_retries: Retries with backoff on 429/5xx (default: YOUTUBE_HTTP_MAX_RETRIES or 3)
+            timeouts: Optional per-endpoint read timeout overrides keyed by endpoint URL
+        """
+        self.api_key = api_key
+        self.debug_messages = os.getenv("DEBUG_YOUTUBE_MESSAGES") == "1"
+        self.timeouts = {**self.DEFAULT_TIMEOUTS, **(timeouts or {})}
+        if pool_size is None:
+            pool_size = int(os.getenv("YOUTUBE_HTTP_POOL_SIZE", "10"))
+        if max_retries is None:
+            max_retries = int(os.getenv("YOUTUBE_HTTP_MAX_RETRIES", "3"))
+        self.max_retries = max_retries
+        self.client = httpx.AsyncClient(
+            # Limits go on the transport: the client ignores limits= when a custom transport is given.
+            # Transport-level retries cover connection failures; status retries are in _get
+            transport=httpx.AsyncHTTPTransport(
+                retries=max_retries,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            )
+        )
+
+    async def aclose(self) -> None:
+        """Close pooled connections."""
+        await self.client.aclose()
+
+    async def _get(self, url: str, params: Dict) -> Dict:
+        """
+        GET an endpoint and return its JSON body, retrying 429/5xx with exponential backoff.
+
+        Raises:
+            requests.RequestException: If the request fails (same error type as the sync client)
+        """
+        timeout = httpx.Timeout(self.timeouts.get(url, 10.0), connect=self.CONNECT_TIMEOUT)
+        try:
+            for attempt in range(self.max_retries + 1):
+                response = await self.client.get(url, params=params, timeout=timeout)
+                if response.status_code in self.RETRY_STATUS_CODES and attempt < self.max_retries:
+                    await asyncio.sleep(0.5 * (2 ** attempt))
+                    continue
+                break
+            response.raise_for_status()
+            data = response.json()
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(f"YouTube API request failed: {str(e)}")
+
+        if 'error' in data:
+            error = data['error']
+            error_msg = error.get('message', 'Unknown error')
+            error_code = error.get('code', 'Unknown')
+            raise requests.exceptions.RequestException(
+                f"YouTube API error ({error_code}): {error_msg}"
+            )
+        return data
+
+    async def get_video_live_metadata(self, video_id: str) -> Dict[str, Optional[str]]:
+        """
+        Fetch combined snippet + liveStreamingDetails to validate cached stream.
+        Returns: {live_broadcast_content, channel_id, active_live_chat_id}
+        """
+        params = {
+            'part': 'snippet,liveStreamingDetails',
+            'id': video_id,
+            'key': self.api_key
+        }
+        data = await self._get(self.VIDEOS_URL, params)
+        items = data.get('items', [])
+        if not items:
+            return {"live_broadcast_content": None, "channel_id": None, "active_live_chat_id": None}
+        item = items[0]
+        snippet = item.get("snippet", {}) or {}
+        live_details = item.get("liveStreamingDetails", {}) or {}
+        return {
+            "live_broadcast_content": snippet.get("liveBroadcastContent"),
+            "channel_id": snippet.get("channelId"),
+            "active_live_chat_id": live_details.get("activeLiveChatId")
+        }
+
+    async def fetch_live_chat_page(
+        self,
+        live_chat_id: str,
+        page_token: Optional[str] = None,
+        max_results: int = 200
+    ) -> Tuple[List[Dict], Optional[str], int]:
+        """
+        Fetch one page of live chat messages.
+
+        Args:
+            live_chat_id: Live chat ID
+            page_token: nextPageToken from the previous page
+            max_results: Page size (1-200)
+
+        Returns:
+            Tuple of (message dicts, nextPageToken, pollingIntervalMillis)
+        """
+        params = {
+            'liveChatId': live_chat_id,
+            'part': 'snippet,authorDetails',
+            'maxResults': min(max(1, max_results), 200),
+            'key': self.api_key
+        }
+        if page_token:
+            params['pageToken'] = page_token
+
+        data = await self._get(self.LIVECHAT_URL, params)
+        messages = parse_live_chat_items(data.get('items', []), debug=self.debug_messages)
+
+        if not self.debug_messages:
+            print(f"TEMP: fetched {len(messages)} live chat messages")
+
+        return messages, data.get('nextPageToken'), data.get('pollingIntervalMillis', 1000)
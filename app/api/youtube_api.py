@@ -1,10 +1,50 @@
+import itertools
 import os
 import re
 import requests
 import time
-from typing import List, Optional, Dict, Tuple
+from datetime import datetime
+from requests.adapters import HTTPAdapter
+from typing import Callable, Iterator, List, Optional, Dict, Tuple
+from urllib3.util.retry import Retry
 from app.models.raffle import RaffleEntry
-from app.utils.youtube import extract_video_id, extract_channel_id
+from app.services.cache import LRUCache, StaleWhileRevalidateCache
+from app.services.executors import youtube_executor
+from app.services.raffle import UserEntryAggregator
+from app.utils.youtube import extract_video_id, extract_channel_id, parse_youtube_timestamp
+
+
+def parse_live_chat_items(items: List[Dict], debug: bool = False) -> List[Dict]:
+    """
+    Convert liveChatMessages items into message dicts.
+    
+    Only text messages, Super Chats and Super Stickers are kept.
+    
+    Args:
+        items: 'items' array from a liveChatMessages.list response
+        debug: Print each raw item (DEBUG_YOUTUBE_MESSAGES)
+        
+    Returns:
+        List of dicts with message_id, username, comment_text and published_at
+    """
+    messages: List[Dict] = []
+    for item in items:
+        if debug:
+            print("TEMP: Live chat message JSON:", item)
+        snippet = item.get('snippet', {})
+        author_details = item.get('authorDetails', {})
+
+        message_type = snippet.get('type', '')
+        if message_type not in ['textMessageEvent', 'superChatEvent', 'superStickerEvent']:
+            continue
+
+        messages.append({
+            'message_id': item.get('id'),
+            'username': author_details.get('displayName', 'Unknown'),
+            'comment_text': snippet.get('displayMessage', ''),
+            'published_at': snippet.get('publishedAt')
+        })
+    return messages
 
 
 class YouTubeAPI:
@@ -16,17 +56,86 @@ class YouTubeAPI:
     CHANNELS_URL = "https://www.googleapis.com/youtube/v3/channels"
     PLAYLISTS_URL = "https://www.googleapis.com/youtube/v3/playlists"
     PLAYLIST_ITEMS_URL = "https://www.googleapis.com/youtube/v3/playlistItems"
+
+    # Per-endpoint read timeouts in seconds (connect timeout is CONNECT_TIMEOUT)
+    CONNECT_TIMEOUT = 5.0
+    DEFAULT_TIMEOUTS = {
+        VIDEOS_URL: 10.0,
+        LIVECHAT_URL: 10.0,
+        SEARCH_URL: 15.0,
+        CHANNELS_URL: 10.0,
+        PLAYLISTS_URL: 15.0,
+        PLAYLIST_ITEMS_URL: 15.0,
+    }
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
     
-    def __init__(self, api_key: str, podcast_playlist_id: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: str,
+        podcast_playlist_id: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        load_channel_handle: Optional[Callable[[str], Optional[str]]] = None,
+        save_channel_handle: Optional[Callable[[str, str], None]] = None
+    ):
         """
         Initialize YouTube API client.
         
         Args:
             api_key: YouTube Data API v3 key
+            podcast_playlist_id: Optional playlist ID listed as the channel's podcasts
+            pool_size: Keep-alive connections per host (default: YOUTUBE_HTTP_POOL_SIZE or 10)
+            max_retries: Retries with backoff on 429/5xx (default: YOUTUBE_HTTP_MAX_RETRIES or 3)
+            timeouts: Optional per-endpoint read timeout overrides keyed by endpoint URL
+            load_channel_handle: Optional persistent lookup of a resolved handle (handle -> channel ID)
+            save_channel_handle: Optional persistent store for a newly resolved handle
         """
         self.api_key = api_key
         self.podcast_playlist_id = podcast_playlist_id
+        # Handles essentially never change owner: resolve each once, then serve from memory/persistent store
+        self._handle_cache = LRUCache(max_size=int(os.getenv("CHANNEL_HANDLE_CACHE_SIZE", "1024")))
+        self.load_channel_handle = load_channel_handle
+        self.save_channel_handle = save_channel_handle
         self.debug_messages = os.getenv("DEBUG_YOUTUBE_MESSAGES") == "1"
+        self.timeouts = {**self.DEFAULT_TIMEOUTS, **(timeouts or {})}
+        if pool_size is None:
+            pool_size = int(os.getenv("YOUTUBE_HTTP_POOL_SIZE", "10"))
+        if max_retries is None:
+            max_retries = int(os.getenv("YOUTUBE_HTTP_MAX_RETRIES", "3"))
+        self.session = self._build_session(pool_size, max_retries)
+        # Channel statistics and the podcast playlist change a few times a day: serve them from
+        # memory and refresh in the background once older than their TTL
+        self._channel_stats_cache = StaleWhileRevalidateCache(
+            "channel statistics",
+            ttl_seconds=float(os.getenv("CHANNEL_STATS_TTL_SECONDS", "600")),
+            executor=youtube_executor
+        )
+        self._playlist_cache = StaleWhileRevalidateCache(
+            "podcast playlist",
+            ttl_seconds=float(os.getenv("PODCAST_PLAYLIST_TTL_SECONDS", "3600")),
+            executor=youtube_executor
+        )
+
+    def _build_session(self, pool_size: int, max_retries: int) -> requests.Session:
+        """Create a shared keep-alive session so polls reuse TLS connections."""
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=self.RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+            raise_on_status=False  # Final 429/5xx response is returned and handled by the caller
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _get(self, url: str, params: Dict) -> requests.Response:
+        """GET through the pooled session with the endpoint's timeout."""
+        return self.session.get(url, params=params, timeout=(self.CONNECT_TIMEOUT, self.timeouts.get(url, 10.0)))
 
     def resolve_channel_id_from_url(self, channel_url: str) -> Optional[str]:
         """
@@ -52,7 +161,7 @@ class YouTubeAPI:
             'id': video_id,
             'key': self.api_key
         }
-        response = requests.get(self.VIDEOS_URL, params=params)
+        response = self._get(self.VIDEOS_URL, params=params)
         response.raise_for_status()
         data = response.json()
         items = data.get('items', [])
@@ -87,7 +196,7 @@ class YouTubeAPI:
         }
         
         try:
-            response = requests.get(self.VIDEOS_URL, params=params)
+            response = self._get(self.VIDEOS_URL, params=params)
             response.raise_for_status()
             data = response.json()
         except requests.exceptions.RequestException as e:
@@ -132,7 +241,7 @@ class YouTubeAPI:
         }
         
         try:
-            response = requests.get(self.VIDEOS_URL, params=params)
+            response = self._get(self.VIDEOS_URL, params=params)
             response.raise_for_status()
             data = response.json()
         except requests.exceptions.RequestException as e:
@@ -158,6 +267,57 @@ class YouTubeAPI:
         
         return live_chat_id
 
+    def get_videos_live_details(self, video_ids: List[str]) -> Dict[str, Dict[str, Optional[str]]]:
+        """
+        Batch-fetch live status and activeLiveChatId for many videos.
+        
+        videos.list accepts up to 50 comma-separated ids, so this is one request
+        per 50 videos instead of one per video.
+        
+        Args:
+            video_ids: YouTube video IDs
+            
+        Returns:
+            Dict mapping video_id to {live_broadcast_content, active_live_chat_id};
+            videos missing from the response are omitted
+            
+        Raises:
+            requests.RequestException: If API request fails
+        """
+        details: Dict[str, Dict[str, Optional[str]]] = {}
+        for start in range(0, len(video_ids), 50):
+            params = {
+                'part': 'snippet,liveStreamingDetails',
+                'id': ','.join(video_ids[start:start + 50]),
+                'key': self.api_key
+            }
+            
+            try:
+                response = self._get(self.VIDEOS_URL, params=params)
+                response.raise_for_status()
+                data = response.json()
+            except requests.exceptions.RequestException as e:
+                raise requests.exceptions.RequestException(
+                    f"Failed to get video details: {str(e)}"
+                )
+            
+            if 'error' in data:
+                error = data['error']
+                error_msg = error.get('message', 'Unknown error')
+                error_code = error.get('code', 'Unknown')
+                raise requests.exceptions.RequestException(
+                    f"YouTube API error ({error_code}): {error_msg}"
+                )
+            
+            for item in data.get('items', []):
+                snippet = item.get('snippet', {}) or {}
+                live_details = item.get('liveStreamingDetails', {}) or {}
+                details[item.get('id')] = {
+                    'live_broadcast_content': snippet.get('liveBroadcastContent'),
+                    'active_live_chat_id': live_details.get('activeLiveChatId')
+                }
+        return details
+
     def check_live_chat_active(self, live_chat_id: str) -> bool:
         """
         Check if a liveChatId is still active by attempting a minimal fetch.
@@ -169,7 +329,7 @@ class YouTubeAPI:
             'key': self.api_key
         }
         try:
-            response = requests.get(self.LIVECHAT_URL, params=params)
+            response = self._get(self.LIVECHAT_URL, params=params)
             response.raise_for_status()
             data = response.json()
         except requests.exceptions.HTTPError:
@@ -206,7 +366,7 @@ class YouTubeAPI:
         if page_token:
             params['pageToken'] = page_token
 
-        response = requests.get(self.LIVECHAT_URL, params=params, timeout=10)
+        response = self._get(self.LIVECHAT_URL, params=params)
         response.raise_for_status()
         data = response.json()
 
@@ -214,202 +374,200 @@ class YouTubeAPI:
         next_page_token = data.get('nextPageToken')
         polling_interval_ms = data.get('pollingIntervalMillis', 1000)
 
-        messages: List[Dict] = []
-        for item in items:
-            if self.debug_messages:
-                print("TEMP: Live chat message JSON:", item)
-            snippet = item.get('snippet', {})
-            author_details = item.get('authorDetails', {})
-
-            message_type = snippet.get('type', '')
-            if message_type not in ['textMessageEvent', 'superChatEvent', 'superStickerEvent']:
-                continue
-
-            messages.append({
-                'message_id': item.get('id'),
-                'username': author_details.get('displayName', 'Unknown'),
-                'comment_text': snippet.get('displayMessage', ''),
-                'published_at': snippet.get('publishedAt')
-            })
+        messages = parse_live_chat_items(items, debug=self.debug_messages)
 
         if not self.debug_messages:
             print(f"TEMP: fetched {len(messages)} live chat messages")
 
         return messages, next_page_token, polling_interval_ms
     
-    def get_live_chat_messages(
+    def iter_live_chat_pages(
         self,
         live_chat_id: str,
-        max_entries_per_user: int = 5,
-        max_messages: int = 10000
-    ) -> Tuple[List[Dict], Optional[int]]:
+        max_messages: Optional[int] = None,
+        max_pages: Optional[int] = None
+    ) -> Iterator[List[Dict]]:
         """
-        Fetch live chat messages from a live chat.
+        Iterate over live chat history one page at a time.
+        
+        Only the current page (up to 200 items) is held in memory; callers fold
+        each yielded page into their own aggregate.
         
         Args:
             live_chat_id: Live chat ID
-            max_entries_per_user: Maximum entries per user (default: 5)
-            max_messages: Maximum number of messages to fetch (default: 10000)
+            max_messages: Optional maximum number of messages to fetch (default: no limit)
+            max_pages: Optional page limit (default: YOUTUBE_CHAT_MAX_PAGES, unset = no limit).
+                Paging stops by itself once a page comes back short, i.e. the history is drained;
+                hitting the limit before that is logged as a truncated history.
             
-        Returns:
-            Tuple of (List of message dictionaries with user info and comment text, 
-                     Optional total results count from API - may not reflect all messages)
+        Yields:
+            List of message dictionaries for each page
             
         Raises:
-            ValueError: If total_results exceeds max_messages
+            ValueError: If total_results exceeds max_messages, or the chat has ended/is disabled
             requests.RequestException: If API request fails
         """
-        messages = []
+        if max_pages is None and os.getenv("YOUTUBE_CHAT_MAX_PAGES"):
+            max_pages = int(os.getenv("YOUTUBE_CHAT_MAX_PAGES"))
         page_token = None
         total_results = None  # Will be set from first response
-        max_pages = 50  # 50 pages × 200 maxResults = 10,000 messages max
+        fetched = 0
         
-        # Use for loop instead of while - max 5 pages (10,000 messages)
-        try:
-            for page_count in range(1, max_pages + 1):
-                params = {
-                    'liveChatId': live_chat_id,
-                    'part': 'snippet,authorDetails',
-                    'maxResults': 200,  # liveChatMessages.list max
-                    'key': self.api_key
-                }
-                
-                if page_token:
-                    params['pageToken'] = page_token
-                
+        for page_count in itertools.count(1):
+            params = {
+                'liveChatId': live_chat_id,
+                'part': 'snippet,authorDetails',
+                'maxResults': 200,  # liveChatMessages.list max
+                'key': self.api_key
+            }
+            
+            if page_token:
+                params['pageToken'] = page_token
+            
+            try:
+                response = self._get(self.LIVECHAT_URL, params=params)
+                response.raise_for_status()
+                data = response.json()
+            except requests.exceptions.HTTPError as e:
                 try:
-                    # LIVECHAT_URL = "https://www.googleapis.com/youtube/v3/liveChat/messages"
-                    response = requests.get(self.LIVECHAT_URL, params=params)
-                    response.raise_for_status()
-                    data = response.json()
-                except requests.exceptions.HTTPError as e:
-                    try:
-                        error_data = response.json()
-                        if 'error' in error_data:
-                            error = error_data['error']
-                            error_msg = error.get('message', 'Unknown error')
-                            error_code = error.get('code', response.status_code)
-                            error_reason = error.get('errors', [{}])[0].get('reason', '') if error.get('errors') else ''
-                            
-                            if error_code == 403:
-                                if error_reason == 'liveChatEnded':
-                                    raise ValueError(
-                                        "The live chat has ended. This video is no longer live."
-                                    )
-                                elif error_reason == 'liveChatDisabled':
-                                    raise ValueError(
-                                        "Live chat is not enabled for this broadcast."
-                                    )
-                                elif 'too soon' in error_msg.lower() or 'refresh' in error_msg.lower():
-                                    # Rate limit error - wait and retry
-                                    polling_interval = data.get('pollingIntervalMillis', 5000) / 1000.0  # Convert to seconds
-                                    raise requests.exceptions.RequestException(
-                                        f"Rate limit: {error_msg}. Please wait {polling_interval:.1f} seconds before retrying."
-                                    )
-                            
-                            raise requests.exceptions.RequestException(
-                                f"YouTube API error ({error_code}): {error_msg}"
-                            )
-                    except ValueError:
+                    error_data = response.json()
+                    if 'error' in error_data:
+                        error = error_data['error']
+                        error_msg = error.get('message', 'Unknown error')
+                        error_code = error.get('code', response.status_code)
+                        error_reason = error.get('errors', [{}])[0].get('reason', '') if error.get('errors') else ''
+                        
+                        if error_code == 403:
+                            if error_reason == 'liveChatEnded':
+                                raise ValueError(
+                                    "The live chat has ended. This video is no longer live."
+                                )
+                            elif error_reason == 'liveChatDisabled':
+                                raise ValueError(
+                                    "Live chat is not enabled for this broadcast."
+                                )
+                            elif 'too soon' in error_msg.lower() or 'refresh' in error_msg.lower():
+                                # Rate limit error - wait and retry
+                                polling_interval = error_data.get('pollingIntervalMillis', 5000) / 1000.0  # Convert to seconds
+                                raise requests.exceptions.RequestException(
+                                    f"Rate limit: {error_msg}. Please wait {polling_interval:.1f} seconds before retrying."
+                                )
+                        
                         raise requests.exceptions.RequestException(
-                            f"YouTube API request failed: {response.status_code} {response.reason}"
+                            f"YouTube API error ({error_code}): {error_msg}"
                         )
-                except requests.exceptions.RequestException as e:
+                except ValueError:
                     raise requests.exceptions.RequestException(
-                        f"YouTube API request failed: {str(e)}"
+                        f"YouTube API request failed: {response.status_code} {response.reason}"
                     )
+            except requests.exceptions.RequestException as e:
+                raise requests.exceptions.RequestException(
+                    f"YouTube API request failed: {str(e)}"
+                )
+            
+            if 'error' in data:
+                error = data['error']
+                error_msg = error.get('message', 'Unknown error')
+                error_code = error.get('code', 'Unknown')
+                raise requests.exceptions.RequestException(
+                    f"YouTube API error ({error_code}): {error_msg}"
+                )
+            
+            # Get total results count from first response (if available)
+            # Note: This may not reflect ALL messages ever sent, only those currently retrievable
+            if total_results is None:
+                page_info = data.get('pageInfo', {})
+                total_results = page_info.get('totalResults')
                 
-                if 'error' in data:
-                    error = data['error']
-                    error_msg = error.get('message', 'Unknown error')
-                    error_code = error.get('code', 'Unknown')
-                    raise requests.exceptions.RequestException(
-                        f"YouTube API error ({error_code}): {error_msg}"
+                # Check if total results exceeds maximum allowed (only when a ceiling is requested)
+                if max_messages and total_results and total_results > max_messages:
+                    raise ValueError(
+                        f"This live stream has {total_results:,} messages, which exceeds the maximum "
+                        f"of {max_messages:,} messages allowed. Please try with a stream that has fewer messages."
                     )
-                
-                # Get total results count from first response (if available)
-                # Note: This may not reflect ALL messages ever sent, only those currently retrievable
-                if total_results is None:
-                    page_info = data.get('pageInfo', {})
-                    total_results = page_info.get('totalResults')
-                    
-                    # Check if total results exceeds maximum allowed
-                    if total_results and total_results > max_messages:
-                        raise ValueError(
-                            f"This live stream has {total_results:,} messages, which exceeds the maximum "
-                            f"of {max_messages:,} messages allowed. Please try with a stream that has fewer messages."
-                        )
-                
-                # Process messages
-                items = data.get('items', [])
-                next_page_token = data.get('nextPageToken')
-                
-                messages_before = len(messages)
-                for item in items:
-                    if self.debug_messages:
-                        print("TEMP: Live chat message JSON:", item)
-                    snippet = item.get('snippet', {})
-                    author_details = item.get('authorDetails', {})
-                    
-                    # Get message type - only process text messages
-                    message_type = snippet.get('type', '')
-                    if message_type not in ['textMessageEvent', 'superChatEvent', 'superStickerEvent']:
-                        continue
-                    
-                    # Get comment text
-                    display_message = snippet.get('displayMessage', '')
-                    
-                    # Get author information
-                    username = author_details.get('displayName', 'Unknown')
-                    
-                    message = {
-                        'message_id': item.get('id'),
-                        'username': username,
-                        'comment_text': display_message
-                    }
-                    messages.append(message)
-                
-                messages_after = len(messages)
-                messages_added = messages_after - messages_before
-                
-                # Stop early if we got 0 messages (no more available)
-                if messages_added == 0 and len(messages) > 0:
-                    break
-                
-                # Stop early if we've reached max_messages
-                if len(messages) >= max_messages:
-                    break
-                
-                # Get nextPageToken for next iteration (if not on last page)
-                if page_count < max_pages:
-                    page_token = next_page_token
-                    if not page_token:
-                        break
-                    
-                    # Respect polling interval to avoid rate limits
-                    polling_interval_ms = data.get('pollingIntervalMillis', 1000)  # Default 1 second
-                    polling_interval_sec = max(0.5, polling_interval_ms / 1000.0)
-                    sleep_time = min(polling_interval_sec, 2.0)  # Cap at 2 seconds max
-                    time.sleep(sleep_time)
-        finally:
-            pass
-
-        return messages, total_results
+            
+            items = data.get('items', [])
+            page_messages = parse_live_chat_items(items, debug=self.debug_messages)
+            next_page_token = data.get('nextPageToken')
+            
+            # Stop early if we got 0 messages (no more available)
+            if not page_messages and (fetched > 0 or page_count > 1):
+                break
+            
+            fetched += len(page_messages)
+            yield page_messages
+            
+            # Stop early if we've reached max_messages
+            if max_messages and fetched >= max_messages:
+                break
+            
+            # A short page means the stored history is drained; later pages are just new live messages
+            if len(items) < params['maxResults']:
+                break
+            
+            if max_pages is not None and page_count >= max_pages:
+                if next_page_token:
+                    print(
+                        f"TEMP: Live chat history truncated at {max_pages} pages ({fetched:,} messages); "
+                        "raise or unset YOUTUBE_CHAT_MAX_PAGES to read all of it"
+                    )
+                break
+            
+            # Get nextPageToken for next iteration
+            page_token = next_page_token
+            if not page_token:
+                break
+            
+            # Respect polling interval to avoid rate limits
+            polling_interval_ms = data.get('pollingIntervalMillis', 1000)  # Default 1 second
+            polling_interval_sec = max(0.5, polling_interval_ms / 1000.0)
+            sleep_time = min(polling_interval_sec, 2.0)  # Cap at 2 seconds max
+            time.sleep(sleep_time)
+    
+    def get_live_chat_messages(
+        self,
+        live_chat_id: str,
+        max_entries_per_user: int = 5,
+        max_messages: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Fetch live chat messages from a live chat into a single list.
+        
+        Prefer iter_live_chat_pages when the messages are only aggregated.
+        
+        Args:
+            live_chat_id: Live chat ID
+            max_entries_per_user: Maximum entries per user (default: 5)
+            max_messages: Optional maximum number of messages to fetch (default: no limit)
+            
+        Returns:
+            List of message dictionaries with user info and comment text
+            
+        Raises:
+            ValueError: If total_results exceeds max_messages
+            requests.RequestException: If API request fails
+        """
+        messages: List[Dict] = []
+        for page_messages in self.iter_live_chat_pages(live_chat_id, max_messages=max_messages):
+            messages.extend(page_messages)
+        return messages
     
     def get_user_entries(
         self,
         video_url: str,
-        max_entries_per_user: int = 5
-    ) -> Tuple[List[RaffleEntry], Dict[str, List[str]], int]:
+        max_entries_per_user: int = 5,
+        since: Optional[datetime] = None
+    ) -> Tuple[List[RaffleEntry], Dict[str, str], int]:
         """
         Fetch live chat messages from YouTube video and create raffle entries.
         
         Args:
             video_url: YouTube video URL (must be an active live stream)
             max_entries_per_user: Maximum entries per user (default: 5)
+            since: Optional naive UTC datetime; only messages published at/after it count
             
         Returns:
-            Tuple of (List of RaffleEntry objects, Dict mapping user keys to their comments, total_comments count)
+            Tuple of (List of RaffleEntry objects, Dict mapping usernames to a sampled comment, total_comments count)
             
         Raises:
             ValueError: If video URL is invalid, not live, or has no live chat
@@ -439,62 +597,47 @@ class YouTubeAPI:
                 "Could not find live chat ID. Live chat may not be enabled for this stream."
             )
         
-        # Step 3: Fetch live chat messages
-        try:
-            messages, total_results = self.get_live_chat_messages(live_chat_id, max_entries_per_user)
-        except (ValueError, requests.exceptions.RequestException) as e:
-            raise e
+        # Step 3 + 4: Fetch live chat pages and fold each page into per-user counts
+        # (one sampled comment each) as it arrives, so only one page is held in memory
+        aggregator = UserEntryAggregator(max_entries_per_user)
+        for page_messages in self.iter_live_chat_pages(live_chat_id):
+            if since is not None:
+                page_messages = [
+                    message for message in page_messages
+                    if (parse_youtube_timestamp(message.get('published_at')) or since) >= since
+                ]
+            aggregator.add_messages(page_messages)
         
-        if not messages:
+        if not aggregator.total_messages:
             raise ValueError("No live chat messages found for this stream.")
         
-        # Store total comment count before processing
-        total_comments = len(messages)
-        
-        # Step 4: Count messages per user and store comment texts
-        user_data: Dict[str, Dict] = {}
-        
-        for message in messages:
-            username = message['username']
-            comment_text = message['comment_text']
-            
-            key = f"user_{username}"
-            
-            if key not in user_data:
-                user_data[key] = {
-                    'user_id': None,
-                    'username': username,
-                    'count': 0,
-                    'comments': []  # Store all comments for this user
-                }
-            
-            # Increment count and store comment (up to max_entries_per_user)
-            if user_data[key]['count'] < max_entries_per_user:
-                user_data[key]['count'] += 1
-                user_data[key]['comments'].append(comment_text)
-        
         # Step 5: Convert to RaffleEntry objects
-        entries = []
-        user_comments_map: Dict[str, List[str]] = {}
-        
-        for key, user_info in user_data.items():
-            if user_info['count'] > 0:
-                entries.append(RaffleEntry(
-                    platform='youtube',
-                    user_id=user_info['user_id'],
-                    username=user_info['username'],
-                    entries=user_info['count'],
-                    comment_text=None  # Will be set when winner is picked
-                ))
-                # Store comments for this user (keyed by username)
-                lookup_key = user_info['username']
-                user_comments_map[lookup_key] = user_info['comments']
-        
-        return entries, user_comments_map, total_comments
+        entries, user_comments_map = aggregator.to_entries(platform='youtube')
+        
+        return entries, user_comments_map, aggregator.total_messages
     
+    def _resolve_channel_id(self, channel_url: Optional[str], channel_id: Optional[str]) -> str:
+        """
+        Return channel_id, or resolve it from channel_url (/channel/ID or @handle).
+
+        Raises:
+            ValueError: If neither is provided or the URL can't be resolved
+        """
+        if not channel_url and not channel_id:
+            raise ValueError("Either channel_url or channel_id must be provided")
+        if channel_id:
+            return channel_id
+        channel_id = self.resolve_channel_id_from_url(channel_url)
+        if not channel_id:
+            raise ValueError("Could not extract or resolve channel ID from URL")
+        return channel_id
+
     def _resolve_channel_handle(self, handle: str) -> Optional[str]:
         """
-        Resolve a channel handle (@channelname) to channel ID using YouTube API.
+        Resolve a channel handle (@channelname) to channel ID.
+
+        Checks the in-memory LRU, then the persistent store, and only then
+        the YouTube API; successful resolutions are written back to both.
         
         Args:
             handle: Channel handle without @ (e.g., "channelname")
@@ -502,6 +645,32 @@ class YouTubeAPI:
         Returns:
             Channel ID if found, None otherwise
         """
+        key = handle.casefold()  # Handles are case-insensitive
+        channel_id = self._handle_cache.get(key)
+        if channel_id:
+            return channel_id
+
+        if self.load_channel_handle:
+            try:
+                channel_id = self.load_channel_handle(key)
+            except Exception as e:
+                print("TEMP: Channel handle lookup failed:", str(e))
+            if channel_id:
+                self._handle_cache.put(key, channel_id)
+                return channel_id
+
+        channel_id = self._fetch_channel_handle(handle)
+        if channel_id:
+            self._handle_cache.put(key, channel_id)
+            if self.save_channel_handle:
+                try:
+                    self.save_channel_handle(key, channel_id)
+                except Exception as e:
+                    print("TEMP: Saving channel handle failed:", str(e))
+        return channel_id
+
+    def _fetch_channel_handle(self, handle: str) -> Optional[str]:
+        """Resolve a handle via channels.list(forHandle) (None if not found or on error)."""
         # Use channels.list with forHandle to resolve handle directly
         params = {
             'part': 'id',
@@ -510,7 +679,7 @@ class YouTubeAPI:
         }
         
         try:
-            response = requests.get(self.CHANNELS_URL, params=params)
+            response = self._get(self.CHANNELS_URL, params=params)
             response.raise_for_status()
             data = response.json()
             
@@ -532,27 +701,38 @@ class YouTubeAPI:
             channel_url: YouTube channel URL (e.g., https://www.youtube.com/@channelname)
             channel_id: YouTube channel ID (alternative to channel_url)
             
+        Statistics and podcast items are served from memory and refreshed in the
+        background once stale; only the first call for a channel waits on YouTube.
+
         Returns:
             Dictionary with title and statistics (subscriber_count, video_count, view_count)
         """
-        if not channel_url and not channel_id:
-            raise ValueError("Either channel_url or channel_id must be provided")
-        
-        # Extract channel_id from URL if needed
-        if channel_url and not channel_id:
-            channel_id = extract_channel_id(channel_url)
-            
-            # If extraction failed, try to resolve @channelname handle
-            if not channel_id:
-                import re
-                handle_match = re.search(r'@([a-zA-Z0-9_-]+)', channel_url)
-                if handle_match:
-                    handle = handle_match.group(1)
-                    channel_id = self._resolve_channel_handle(handle)
-            
-            if not channel_id:
-                raise ValueError("Could not extract or resolve channel ID from URL")
-        
+        channel_id = self._resolve_channel_id(channel_url, channel_id)
+
+        stats = self._channel_stats_cache.get(channel_id, lambda: self._fetch_channel_stats(channel_id))
+        if not stats:
+            return {}
+
+        podcast_items = []
+        if self.podcast_playlist_id:
+            playlist_id = self.podcast_playlist_id
+            try:
+                # Strict loader: a failed (re)fetch raises, so the cache never stores a truncated list
+                podcast_items = self._playlist_cache.get(
+                    playlist_id,
+                    lambda: self._get_playlist_items(playlist_id, max_items=200, strict=True)
+                )
+            except requests.exceptions.RequestException as e:
+                print("TEMP: Podcast playlist unavailable:", str(e))
+
+        return {
+            **stats,
+            'podcast_count': len(podcast_items),
+            'podcasts': podcast_items
+        }
+
+    def _fetch_channel_stats(self, channel_id: str) -> Dict:
+        """Fetch title, subscriber and video counts for a channel ({} if not found)."""
         params = {
             'part': 'snippet,statistics',
             'id': channel_id,
@@ -560,7 +740,7 @@ class YouTubeAPI:
         }
         
         try:
-            response = requests.get(self.CHANNELS_URL, params=params)
+            response = self._get(self.CHANNELS_URL, params=params)
             response.raise_for_status()
             data = response.json()
         except requests.exceptions.RequestException as e:
@@ -590,16 +770,10 @@ class YouTubeAPI:
             except (ValueError, TypeError):
                 return None
         
-        podcast_items = []
-        if self.podcast_playlist_id:
-            podcast_items = self._get_playlist_items(self.podcast_playlist_id, max_items=200)
-
         return {
             'title': snippet.get('title'),
             'subscriber_count': to_int(stats.get('subscriberCount')),
-            'video_count': to_int(stats.get('videoCount')),
-            'podcast_count': len(podcast_items),
-            'podcasts': podcast_items
+            'video_count': to_int(stats.get('videoCount'))
         }
 
     def _get_podcast_playlist_items(self, channel_id: str, max_items: int = 200) -> List[Dict]:
@@ -628,7 +802,7 @@ class YouTubeAPI:
                 params['pageToken'] = page_token
 
             try:
-                response = requests.get(self.PLAYLISTS_URL, params=params)
+                response = self._get(self.PLAYLISTS_URL, params=params)
                 response.raise_for_status()
                 data = response.json()
             except requests.exceptions.RequestException:
@@ -659,16 +833,20 @@ class YouTubeAPI:
 
         return items
 
-    def _get_playlist_items(self, playlist_id: str, max_items: int = 200) -> List[Dict]:
+    def _get_playlist_items(self, playlist_id: str, max_items: int = 200, strict: bool = False) -> List[Dict]:
         """
         Collect items from a specific playlist.
         
         Args:
             playlist_id: YouTube playlist ID
             max_items: Maximum playlist items to return
+            strict: Raise on a failed page instead of returning the items collected so far
             
         Returns:
             List of playlist items (title + video_url)
+
+        Raises:
+            requests.RequestException: If strict and a page request fails
         """
         items: List[Dict] = []
         seen_video_ids = set()
@@ -676,7 +854,8 @@ class YouTubeAPI:
             playlist_id,
             items,
             seen_video_ids,
-            max_items=max_items
+            max_items=max_items,
+            strict=strict
         )
         return items
 
@@ -685,9 +864,10 @@ class YouTubeAPI:
         playlist_id: str,
         items: List[Dict],
         seen_video_ids: set,
-        max_items: int
+        max_items: int,
+        strict: bool = False
     ) -> None:
-        """Append playlist videos into items list (deduped by videoId)."""
+        """Append playlist videos into items list (deduped by videoId); strict raises on a failed page."""
         page_token = None
 
         while len(items) < max_items:
@@ -701,13 +881,20 @@ class YouTubeAPI:
                 params['pageToken'] = page_token
 
             try:
-                response = requests.get(self.PLAYLIST_ITEMS_URL, params=params)
+                response = self._get(self.PLAYLIST_ITEMS_URL, params=params)
                 response.raise_for_status()
                 data = response.json()
             except requests.exceptions.RequestException:
+                if strict:
+                    raise
                 return
 
             if 'error' in data:
+                if strict:
+                    error = data['error']
+                    raise requests.exceptions.RequestException(
+                        f"YouTube API error ({error.get('code', 'Unknown')}): {error.get('message', 'Unknown error')}"
+                    )
                 return
 
             playlist_items = data.get('items', [])
@@ -745,23 +932,7 @@ class YouTubeAPI:
             ValueError: If neither channel_url nor channel_id is provided
             requests.RequestException: If API request fails
         """
-        if not channel_url and not channel_id:
-            raise ValueError("Either channel_url or channel_id must be provided")
-        
-        # Extract channel_id from URL if needed
-        if channel_url and not channel_id:
-            channel_id = extract_channel_id(channel_url)
-            
-            # If extraction failed, try to resolve @channelname handle
-            if not channel_id:
-                import re
-                handle_match = re.search(r'@([a-zA-Z0-9_-]+)', channel_url)
-                if handle_match:
-                    handle = handle_match.group(1)
-                    channel_id = self._resolve_channel_handle(handle)
-            
-            if not channel_id:
-                raise ValueError("Could not extract or resolve channel ID from URL")
+        channel_id = self._resolve_channel_id(channel_url, channel_id)
         
         # Search for active live streams (get up to 50 to handle multiple streams)
         params = {
@@ -774,7 +945,7 @@ class YouTubeAPI:
         }
         
         try:
-            response = requests.get(self.SEARCH_URL, params=params)
+            response = self._get(self.SEARCH_URL, params=params)
             response.raise_for_status()
             data = response.json()
         except requests.exceptions.RequestException as e:
@@ -794,6 +965,11 @@ class YouTubeAPI:
         if not items:
             return []
         
+        # Resolve live chat IDs for all results with one batched videos.list call
+        video_ids = [video.get('id', {}).get('videoId') for video in items]
+        video_ids = [video_id for video_id in video_ids if video_id]
+        live_details = self.get_videos_live_details(video_ids)
+        
         # Process all live streams
         streams = []
         for video in items:
@@ -805,16 +981,15 @@ class YouTubeAPI:
             snippet = video.get('snippet', {})
             title = snippet.get('title', 'Untitled Stream')
             
-            # Get live chat ID for this video
-            try:
-                live_chat_id = self.get_live_chat_id(video_id)
-            except requests.exceptions.RequestException:
-                live_chat_id = None
+            details = live_details.get(video_id, {})
+            # Search results can lag behind; skip streams videos.list reports as no longer live
+            if details.get('live_broadcast_content') not in (None, 'live'):
+                continue
             
             streams.append({
                 'video_id': video_id,
                 'video_url': f"https://www.youtube.com/watch?v={video_id}",
-                'live_chat_id': live_chat_id,
+                'live_chat_id': details.get('active_live_chat_id'),
                 'title': title
             })
         
@@ -835,23 +1010,7 @@ class YouTubeAPI:
             ValueError: If neither channel_url nor channel_id is provided
             requests.RequestException: If API request fails
         """
-        if not channel_url and not channel_id:
-            raise ValueError("Either channel_url or channel_id must be provided")
-        
-        # Extract channel_id from URL if needed
-        if channel_url and not channel_id:
-            channel_id = extract_channel_id(channel_url)
-            
-            # If extraction failed, try to resolve @channelname handle
-            if not channel_id:
-                import re
-                handle_match = re.search(r'@([a-zA-Z0-9_-]+)', channel_url)
-                if handle_match:
-                    handle = handle_match.group(1)
-                    channel_id = self._resolve_channel_handle(handle)
-            
-            if not channel_id:
-                raise ValueError("Could not extract or resolve channel ID from URL")
+        channel_id = self._resolve_channel_id(channel_url, channel_id)
         
         # Use get_active_live_streams and return first one
         streams = self.get_active_live_streams(channel_url=channel_url, channel_id=channel_id)
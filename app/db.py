@@ -1,11 +1,17 @@
+import io
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, create_engine, text
-from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint, case, cast, create_engine, func, text, update
+from sqlalchemy.dialects.postgresql import array_agg, insert as pg_insert
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 
+from app.utils.youtube import parse_youtube_timestamp
+
 
 def _normalize_database_url(raw_url: Optional[str]) -> Optional[str]:
     if not raw_url:
@@ -15,11 +21,62 @@ def _normalize_database_url(raw_url: Optional[str]) -> Optional[str]:
     return raw_url
 
 
+def _async_database_url(url: Optional[str]) -> Tuple[Optional[URL], Dict]:
+    # Same database through asyncpg, which rejects libpq-only query parameters: translate the
+    # ones it has an equivalent for into connect_args and drop the rest
+    if not url:
+        return None, {}
+    parsed = make_url(url)
+    query = dict(parsed.query)
+    connect_args: Dict = {}
+    server_settings: Dict[str, str] = {}
+    if "sslmode" in query:
+        query.setdefault("ssl", query.pop("sslmode"))
+    if "ssl" in query:
+        connect_args["ssl"] = query.pop("ssl")
+    if "connect_timeout" in query:
+        connect_args["timeout"] = float(query.pop("connect_timeout"))
+    if "application_name" in query:
+        server_settings["application_name"] = query.pop("application_name")
+    if "options" in query:
+        # libpq "-c name=value -c ..." startup options
+        for option in query.pop("options").replace("-c ", " ").split():
+            name, _, value = option.partition("=")
+            if value:
+                server_settings[name] = value
+    if server_settings:
+        connect_args["server_settings"] = server_settings
+    if query:
+        print("TEMP: Ignoring DATABASE_URL parameters not supported by asyncpg:", ", ".join(sorted(query)))
+    return parsed.set(drivername="postgresql+asyncpg", query={}), connect_args
+
+
 DATABASE_URL = _normalize_database_url(os.getenv("DATABASE_URL"))
 engine = create_engine(DATABASE_URL, pool_pre_ping=True) if DATABASE_URL else None
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) if engine else None
+# Request handlers use the async engine so DB waits never block the event loop;
+# the collector and background jobs keep the sync engine in worker threads.
+ASYNC_DATABASE_URL, _async_connect_args = _async_database_url(DATABASE_URL)
+async_engine = (
+    create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True, connect_args=_async_connect_args)
+    if ASYNC_DATABASE_URL else None
+)
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) if async_engine else None
+)
 Base = declarative_base()
 
+MAX_ENTRIES_PER_USER = 5
+# Batches at least this large are ingested via COPY into a staging table instead of multi-VALUES INSERT
+BULK_INGEST_MIN_ROWS = int(os.getenv("BULK_INGEST_MIN_ROWS", "500"))
+# Retired sessions are kept this long before the background purge deletes their rows
+SESSION_RETENTION_HOURS = float(os.getenv("SESSION_RETENTION_HOURS", "24"))
+SESSION_PURGE_BATCH_ROWS = int(os.getenv("SESSION_PURGE_BATCH_ROWS", "5000"))
+# Partitions are created ahead of time for this many upcoming session ids (DDL never runs in handlers)
+SESSION_PARTITION_LOOKAHEAD = int(os.getenv("SESSION_PARTITION_LOOKAHEAD", "20"))
+# Creating a partition briefly locks stream_messages; give up quickly rather than queue behind long reads
+SESSION_PARTITION_LOCK_TIMEOUT_MS = int(os.getenv("SESSION_PARTITION_LOCK_TIMEOUT_MS", "500"))
+
 
 class StreamSession(Base):
     __tablename__ = "stream_sessions"
@@ -31,30 +88,84 @@ class StreamSession(Base):
     video_id = Column(String(128), nullable=True)
     video_url = Column(Text, nullable=True)
     next_page_token = Column(Text, nullable=True)
+    # publishedAt of the newest stored message, checkpointed with next_page_token
+    last_published_at = Column(DateTime, nullable=True)
     total_comments = Column(Integer, nullable=False, default=0)
+    # Set when another session replaces this one; NULL while the session is in use
+    retired_at = Column(DateTime, nullable=True, index=True)
 
     messages = relationship("StreamMessage", back_populates="session", cascade="all, delete-orphan")
+    tallies = relationship("UserTally", back_populates="session", cascade="all, delete-orphan")
 
 
 class StreamMessage(Base):
+    # LIST-partitioned by session_id (one partition per session, created ahead of time by
+    # precreate_session_partitions), so per-session queries prune to a single partition and
+    # purging a session is a concurrent DETACH + DROP TABLE
     __tablename__ = "stream_messages"
+    __table_args__ = (
+        # Unique keys on a partitioned table must include the partition key
+        UniqueConstraint("session_id", "message_id", name="uq_stream_messages_session_message_id"),
+        # Index-range scans for time-window raffles
+        Index("ix_stream_messages_session_published_at", "session_id", "published_at"),
+        # Index-only grouped scans for per-user aggregation (chat messages are short enough to INCLUDE)
+        Index(
+            "ix_stream_messages_session_username",
+            "session_id",
+            "username",
+            postgresql_include=["comment_text"]
+        ),
+        {"postgresql_partition_by": "LIST (session_id)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("stream_sessions.id"), nullable=False, index=True)
-    message_id = Column(String(128), unique=True, index=True, nullable=True)
+    # No single-column indexes: the PK, the unique constraint and the (session_id, ...) indexes cover every lookup
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(Integer, ForeignKey("stream_sessions.id"), primary_key=True)
+    message_id = Column(String(128), nullable=True)
     username = Column(String(255), nullable=False)
     comment_text = Column(Text, nullable=False)
+    # YouTube snippet.publishedAt (insert time if YouTube didn't send one)
+    published_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     session = relationship("StreamSession", back_populates="messages")
 
 
+class UserTally(Base):
+    # Maintained incrementally by write_message_batch, so draws never rescan stream_messages
+    __tablename__ = "user_tallies"
+    __table_args__ = (UniqueConstraint("session_id", "username", name="uq_user_tallies_session_username"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(Integer, ForeignKey("stream_sessions.id"), nullable=False, index=True)
+    username = Column(String(255), nullable=False)
+    message_count = Column(Integer, nullable=False, default=0)
+    capped_count = Column(Integer, nullable=False, default=0)
+    # Reservoir (size 1) over all of the user's messages
+    sample_comment = Column(Text, nullable=True)
+
+    session = relationship("StreamSession", back_populates="tallies")
+
+
+class ChannelHandle(Base):
+    # Persistent @handle -> channel ID resolutions (shared by all YouTubeAPI lookups, survives restarts)
+    __tablename__ = "channel_handles"
+
+    handle = Column(String(255), primary_key=True)
+    channel_id = Column(String(128), nullable=False)
+    resolved_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
 def init_db() -> None:
     if not DATABASE_URL:
         raise RuntimeError("DATABASE_URL is required but not set.")
     print("TEMP: Initializing database schema")
     if engine:
-        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            legacy_messages = _rename_legacy_stream_messages(conn)
+            Base.metadata.create_all(bind=conn)
+            if legacy_messages:
+                _copy_legacy_stream_messages(conn)
         print("TEMP: Database schema ready")
         # Best-effort migrations for dev/prod without Alembic
         try:
@@ -63,10 +174,154 @@ def init_db() -> None:
                 conn.execute(text("ALTER TABLE stream_sessions ADD COLUMN IF NOT EXISTS channel_url TEXT;"))
                 conn.execute(text("ALTER TABLE stream_sessions ADD COLUMN IF NOT EXISTS video_id VARCHAR(128);"))
                 conn.execute(text("ALTER TABLE stream_sessions ADD COLUMN IF NOT EXISTS video_url TEXT;"))
-                conn.execute(text("ALTER TABLE stream_messages ADD COLUMN IF NOT EXISTS message_id VARCHAR(128);"))
-                conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_stream_messages_message_id ON stream_messages (message_id);"))
+                conn.execute(text("ALTER TABLE stream_sessions ADD COLUMN IF NOT EXISTS last_published_at TIMESTAMP;"))
+                conn.execute(text("ALTER TABLE stream_sessions ADD COLUMN IF NOT EXISTS retired_at TIMESTAMP;"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_stream_sessions_retired_at ON stream_sessions (retired_at);"))
+                conn.execute(text("ALTER TABLE stream_messages ADD COLUMN IF NOT EXISTS published_at TIMESTAMP;"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_stream_messages_session_published_at ON stream_messages (session_id, published_at);"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_stream_messages_session_username ON stream_messages (session_id, username) INCLUDE (comment_text);"))
+                conn.execute(text("DROP INDEX IF EXISTS ix_stream_messages_id;"))
+                conn.execute(text("DROP INDEX IF EXISTS ix_stream_messages_session_id;"))
+                conn.execute(text("DROP INDEX IF EXISTS ix_stream_messages_message_id;"))
         except Exception as e:
             print("TEMP: DB migration skipped/failed:", str(e))
+        # After the migrations: this reads stream_sessions.retired_at
+        try:
+            with engine.begin() as conn:
+                for session_id in _pending_partition_session_ids(conn, SESSION_PARTITION_LOOKAHEAD):
+                    _create_session_partition(conn, session_id)
+        except Exception as e:
+            print("TEMP: Partition pre-create skipped/failed (retried in the background):", str(e))
+        try:
+            with engine.begin() as conn:
+                _backfill_user_tallies(conn)
+        except Exception as e:
+            print("TEMP: user_tallies backfill skipped/failed:", str(e))
+
+
+def _backfill_user_tallies(conn) -> None:
+    # Sessions recorded before tallies existed: build their tallies from stored messages, so the
+    # first newly tallied message doesn't hide every earlier one from draws and the live pool.
+    # Only sessions with no tallies at all are scanned, so this is cheap once backfilled.
+    conn.execute(
+        text(
+            "INSERT INTO user_tallies (session_id, username, message_count, capped_count, sample_comment) "
+            "SELECT m.session_id, m.username, count(*), least(count(*), :max_entries), "
+            "(array_agg(m.comment_text))[1 + floor(random() * count(*))::int] "
+            "FROM stream_messages m "
+            "WHERE NOT EXISTS (SELECT 1 FROM user_tallies t WHERE t.session_id = m.session_id) "
+            "GROUP BY m.session_id, m.username "
+            "ON CONFLICT DO NOTHING;"
+        ),
+        {"max_entries": MAX_ENTRIES_PER_USER}
+    )
+
+
+def _rename_legacy_stream_messages(conn) -> bool:
+    # A plain (non-partitioned) stream_messages from before partitioning is moved aside,
+    # together with its sequence and indexes, so create_all can build the partitioned table
+    relkind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('stream_messages');")).scalar()
+    if relkind != "r":
+        return False
+    print("TEMP: Migrating stream_messages to a partitioned table")
+    conn.execute(text("ALTER TABLE stream_messages ADD COLUMN IF NOT EXISTS message_id VARCHAR(128);"))
+    conn.execute(text("ALTER TABLE stream_messages ADD COLUMN IF NOT EXISTS published_at TIMESTAMP;"))
+    conn.execute(text("ALTER TABLE stream_messages RENAME TO stream_messages_legacy;"))
+    conn.execute(text("ALTER SEQUENCE IF EXISTS stream_messages_id_seq RENAME TO stream_messages_legacy_id_seq;"))
+    index_names = conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = 'stream_messages_legacy';")
+    ).scalars().all()
+    for index_name in index_names:
+        conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:50]}_legacy";'))
+    return True
+
+
+def _copy_legacy_stream_messages(conn) -> None:
+    session_ids = conn.execute(text("SELECT id FROM stream_sessions;")).scalars().all()
+    for session_id in session_ids:
+        _create_session_partition(conn, session_id)
+    conn.execute(text(
+        "INSERT INTO stream_messages (id, session_id, message_id, username, comment_text, published_at, created_at) "
+        "SELECT id, session_id, message_id, username, comment_text, COALESCE(published_at, created_at), created_at "
+        "FROM stream_messages_legacy "
+        "ON CONFLICT DO NOTHING;"
+    ))
+    conn.execute(text(
+        "SELECT setval(pg_get_serial_sequence('stream_messages', 'id'), "
+        "COALESCE((SELECT MAX(id) FROM stream_messages), 0) + 1, false);"
+    ))
+    conn.execute(text("DROP TABLE stream_messages_legacy;"))
+
+
+def _session_partition_name(session_id: int) -> str:
+    return f"stream_messages_s{int(session_id)}"
+
+
+def _create_session_partition(conn, session_id: int) -> None:
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {_session_partition_name(session_id)} "
+        f"PARTITION OF stream_messages FOR VALUES IN ({int(session_id)});"
+    ))
+
+
+def _pending_partition_session_ids(conn, lookahead: int) -> List[int]:
+    # Active sessions plus the next 'lookahead' ids the sequence will hand out, minus those that have a partition
+    return conn.execute(
+        text(
+            "SELECT id FROM ("
+            "SELECT id FROM stream_sessions WHERE retired_at IS NULL "
+            "UNION SELECT generate_series(last_id + 1, last_id + :lookahead) FROM ("
+            "SELECT COALESCE(pg_sequence_last_value(pg_get_serial_sequence('stream_sessions', 'id')::regclass), 0) "
+            "AS last_id) seq"
+            ") ids WHERE to_regclass('stream_messages_s' || id) IS NULL ORDER BY id;"
+        ),
+        {"lookahead": lookahead}
+    ).scalars().all()
+
+
+def _create_session_partition_with_lock_timeout(conn, session_id: int) -> None:
+    conn.execute(text(f"SET LOCAL lock_timeout = {int(SESSION_PARTITION_LOCK_TIMEOUT_MS)};"))
+    _create_session_partition(conn, session_id)
+
+
+def precreate_session_partitions(db, lookahead: Optional[int] = None) -> int:
+    """Create partitions for active and upcoming sessions (background job).
+
+    Each CREATE runs in its own short transaction under lock_timeout; one that can't get
+    the lock is left for the next run. Returns the number of partitions created.
+    """
+    if lookahead is None:
+        lookahead = SESSION_PARTITION_LOOKAHEAD
+    bind = db.get_bind()
+    with bind.connect() as conn:
+        session_ids = _pending_partition_session_ids(conn, lookahead)
+    created = 0
+    for session_id in session_ids:
+        try:
+            with bind.begin() as conn:
+                _create_session_partition_with_lock_timeout(conn, session_id)
+            created += 1
+        except Exception as e:
+            print("TEMP: Could not create partition for session", session_id, str(e))
+            break
+    return created
+
+
+def ensure_session_partition(db, session: StreamSession) -> None:
+    # Normally a no-op (partitions are pre-created). Called by the collector before its first write,
+    # never from request handlers; on lock timeout it raises and the collector retries next poll.
+    exists = db.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL;"), {"name": _session_partition_name(session.id)}
+    ).scalar()
+    if exists:
+        db.commit()
+        return
+    try:
+        _create_session_partition_with_lock_timeout(db, session.id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
 
 
 def get_db_session():
@@ -75,6 +330,17 @@ def get_db_session():
     return SessionLocal()
 
 
+def get_async_db_session() -> AsyncSession:
+    """Async session for request handlers.
+
+    The helpers in this module take a sync Session, so handlers call them through
+    ``await db.run_sync(helper, ...)``, which runs them on the asyncpg connection.
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError("DATABASE_URL is required but not set.")
+    return AsyncSessionLocal()
+
+
 def get_or_create_stream_session(
     db,
     live_chat_id: str,
@@ -84,32 +350,137 @@ def get_or_create_stream_session(
     origin: Optional[str] = None,
     channel_url: Optional[str] = None
 ) -> StreamSession:
-    session = db.query(StreamSession).filter(StreamSession.live_chat_id == live_chat_id).first()
-    if session:
+    session = get_stream_session(db, live_chat_id)
+    if session and session.retired_at is None:
         return session
     if reset_on_new_live_chat:
-        clear_stream_data(db)
-    session = StreamSession(
-        live_chat_id=live_chat_id,
-        origin=origin,
-        channel_url=channel_url,
-        video_id=video_id,
-        video_url=video_url
-    )
-    db.add(session)
-    db.commit()
-    db.refresh(session)
+        current_session = get_current_stream_session(db)
+        if current_session and current_session.live_chat_id != live_chat_id:
+            current_session.retired_at = datetime.utcnow()
+    if session:
+        # Switching back to a retired chat before it was purged: reuse its stored data
+        session.retired_at = None
+        db.commit()
+    else:
+        session = StreamSession(
+            live_chat_id=live_chat_id,
+            origin=origin,
+            channel_url=channel_url,
+            video_id=video_id,
+            video_url=video_url
+        )
+        db.add(session)
+        db.commit()
+        db.refresh(session)
     return session
 
 
+# Sessions started through the per-chat collector endpoints run alongside the main one
+COLLECTOR_ORIGIN = "collector"
+
+
 def get_current_stream_session(db) -> Optional[StreamSession]:
-    return db.query(StreamSession).order_by(StreamSession.id.desc()).first()
+    return (
+        db.query(StreamSession)
+        .filter(StreamSession.origin.is_distinct_from(COLLECTOR_ORIGIN))
+        .filter(StreamSession.retired_at.is_(None))
+        .order_by(StreamSession.id.desc())
+        .first()
+    )
+
+
+def get_stream_session(db, live_chat_id: str) -> Optional[StreamSession]:
+    return db.query(StreamSession).filter(StreamSession.live_chat_id == live_chat_id).first()
+
+
+def retire_stream_session(db, session: StreamSession) -> None:
+    # Instant switch: only flags the row; purge_retired_sessions deletes its data later in the background
+    session.retired_at = datetime.utcnow()
+    db.commit()
+
+
+def purge_retired_sessions(
+    db,
+    retention: Optional[timedelta] = None,
+    batch_rows: Optional[int] = None
+) -> int:
+    """Delete sessions retired longer than the retention period.
+
+    A session's messages go with its partition (DETACH ... CONCURRENTLY, then DROP of the
+    detached table); tallies are deleted in small batches, each its own short transaction,
+    so the collector and readers of other sessions are never blocked. Returns the number
+    of sessions purged.
+    """
+    if retention is None:
+        retention = timedelta(hours=SESSION_RETENTION_HOURS)
+    if batch_rows is None:
+        batch_rows = SESSION_PURGE_BATCH_ROWS
+    cutoff = datetime.utcnow() - retention
+    session_ids = [
+        row[0] for row in db.query(StreamSession.id)
+        .filter(StreamSession.retired_at.isnot(None), StreamSession.retired_at < cutoff)
+        .all()
+    ]
+    db.commit()
+
+    purged = 0
+    for session_id in session_ids:
+        try:
+            _detach_and_drop_session_partition(db, session_id, cutoff)
+        except Exception as e:
+            db.rollback()
+            print("TEMP: Could not drop partition for session", session_id, str(e))
+            continue
+        # Tallies are deleted in batches
+        while True:
+            # Re-checks retirement per batch so a session reused mid-purge keeps its remaining rows
+            result = db.execute(
+                text(
+                    "DELETE FROM user_tallies WHERE session_id = :session_id AND id IN "
+                    "(SELECT id FROM user_tallies WHERE session_id = :session_id LIMIT :batch_rows) "
+                    "AND EXISTS (SELECT 1 FROM stream_sessions "
+                    "WHERE id = :session_id AND retired_at < :cutoff)"
+                ),
+                {"session_id": session_id, "batch_rows": batch_rows, "cutoff": cutoff}
+            )
+            db.commit()
+            if result.rowcount < batch_rows:
+                break
+        result = db.execute(
+            text("DELETE FROM stream_sessions WHERE id = :session_id AND retired_at < :cutoff"),
+            {"session_id": session_id, "cutoff": cutoff}
+        )
+        db.commit()
+        purged += result.rowcount
+    return purged
 
 
-def clear_stream_data(db) -> None:
-    # Fast reset (avoids long deletes/locks when many rows)
-    db.execute(text("TRUNCATE TABLE stream_messages, stream_sessions RESTART IDENTITY CASCADE;"))
+def _detach_and_drop_session_partition(db, session_id: int, cutoff: datetime) -> None:
+    still_retired = db.execute(
+        text("SELECT 1 FROM stream_sessions WHERE id = :session_id AND retired_at < :cutoff;"),
+        {"session_id": session_id, "cutoff": cutoff}
+    ).first()
     db.commit()
+    if not still_retired:
+        return
+    name = _session_partition_name(session_id)
+    # DETACH CONCURRENTLY (PostgreSQL 14+) only waits for running queries instead of taking an
+    # ACCESS EXCLUSIVE lock on stream_messages; it can't run inside a transaction block.
+    with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        detach_pending = conn.execute(
+            text(
+                "SELECT inhdetachpending FROM pg_inherits "
+                "WHERE inhrelid = to_regclass(:name) AND inhparent = 'stream_messages'::regclass;"
+            ),
+            {"name": name}
+        ).scalar()
+        if detach_pending is True:
+            # An earlier concurrent detach was interrupted
+            conn.execute(text(f"ALTER TABLE stream_messages DETACH PARTITION {name} FINALIZE;"))
+        elif detach_pending is False:
+            conn.execute(text(f"ALTER TABLE stream_messages DETACH PARTITION {name} CONCURRENTLY;"))
+        # The detached table is standalone now: dropping it doesn't touch stream_messages
+        conn.execute(text(f"DROP TABLE IF EXISTS {name};"))
 
 
 def update_stream_session(
@@ -131,9 +502,37 @@ def update_stream_session(
     db.commit()
 
 
-def add_messages(db, session: StreamSession, messages: List[Dict]) -> None:
+def write_message_batch(
+    db,
+    session: StreamSession,
+    messages: List[Dict],
+    next_page_token: Optional[str] = None
+) -> List[Dict]:
+    # Messages, tallies, total_comments and the checkpoint (page token + newest publishedAt)
+    # in one transaction/commit, so a restart resumes exactly where the last commit left off
+    inserted = _insert_messages(db, session, messages)
+    if next_page_token is not None:
+        session.next_page_token = next_page_token
+    published = [parse_youtube_timestamp(message.get("published_at")) for message in messages]
+    latest_published_at = max((value for value in published if value is not None), default=None)
+    if latest_published_at and (session.last_published_at is None or latest_published_at > session.last_published_at):
+        session.last_published_at = latest_published_at
+    db.commit()
+    return inserted
+
+
+def _insert_messages(db, session: StreamSession, messages: List[Dict]) -> List[Dict]:
+    if len(messages) >= BULK_INGEST_MIN_ROWS:
+        inserted = _copy_insert_messages(db, session, messages)
+    else:
+        inserted = _values_insert_messages(db, session, messages)
+    _apply_inserted(db, session, inserted)
+    return inserted
+
+
+def _values_insert_messages(db, session: StreamSession, messages: List[Dict]) -> List[Dict]:
     if not messages:
-        return
+        return []
     rows = []
     for message in messages:
         rows.append({
@@ -141,7 +540,182 @@ def add_messages(db, session: StreamSession, messages: List[Dict]) -> None:
             "message_id": message.get("message_id"),
             "username": message.get("username", "Unknown"),
             "comment_text": message.get("comment_text", ""),
+            "published_at": parse_youtube_timestamp(message.get("published_at")) or datetime.utcnow(),
         })
-    stmt = pg_insert(StreamMessage.__table__).values(rows).on_conflict_do_nothing(index_elements=["message_id"])
+    stmt = (
+        pg_insert(StreamMessage.__table__)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["session_id", "message_id"])
+        .returning(StreamMessage.__table__.c.username, StreamMessage.__table__.c.comment_text)
+    )
+    return [{"username": row.username, "comment_text": row.comment_text} for row in db.execute(stmt)]
+
+
+def _copy_csv_field(value: Optional[str]) -> str:
+    # Unquoted empty field is NULL in COPY CSV; everything else is quoted
+    if value is None:
+        return ""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _isoformat_or_none(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _copy_insert_messages(db, session: StreamSession, messages: List[Dict]) -> List[Dict]:
+    if not messages:
+        return []
+    # Stream rows into a per-connection staging table with COPY, then merge with dedup on (session_id, message_id)
+    db.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS stream_messages_staging ("
+        "message_id VARCHAR(128), username VARCHAR(255) NOT NULL, comment_text TEXT NOT NULL, published_at TIMESTAMP"
+        ") ON COMMIT DELETE ROWS;"
+    ))
+    buffer = io.StringIO()
+    for message in messages:
+        buffer.write(",".join((
+            _copy_csv_field(message.get("message_id")),
+            _copy_csv_field(message.get("username", "Unknown")),
+            _copy_csv_field(message.get("comment_text", "")),
+            _copy_csv_field(_isoformat_or_none(parse_youtube_timestamp(message.get("published_at")))),
+        )))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY stream_messages_staging (message_id, username, comment_text, published_at) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+    result = db.execute(
+        text(
+            "INSERT INTO stream_messages (session_id, message_id, username, comment_text, published_at, created_at) "
+            "SELECT :session_id, message_id, username, comment_text, "
+            "COALESCE(published_at, now() AT TIME ZONE 'utc'), (now() AT TIME ZONE 'utc') "
+            "FROM stream_messages_staging "
+            "ON CONFLICT (session_id, message_id) DO NOTHING "
+            "RETURNING username, comment_text;"
+        ),
+        {"session_id": session.id}
+    )
+    inserted = [{"username": row.username, "comment_text": row.comment_text} for row in result]
+    # Empty the staging table now in case the caller keeps the transaction open
+    db.execute(text("TRUNCATE stream_messages_staging;"))
+    return inserted
+
+
+def _apply_inserted(db, session: StreamSession, inserted: List[Dict]) -> None:
+    # Only rows actually inserted (not duplicates) count towards tallies and total_comments
+    if inserted:
+        _upsert_user_tallies(db, session, inserted)
+        db.execute(
+            update(StreamSession.__table__)
+            .where(StreamSession.__table__.c.id == session.id)
+            .values(total_comments=StreamSession.__table__.c.total_comments + len(inserted))
+        )
+
+
+def _upsert_user_tallies(db, session: StreamSession, inserted: List[Dict]) -> None:
+    if not inserted:
+        return
+    batch: Dict[str, Dict] = {}
+    for message in inserted:
+        tally = batch.setdefault(message["username"], {
+            "session_id": session.id,
+            "username": message["username"],
+            "message_count": 0,
+            "capped_count": 0,
+            "sample_comment": None,
+        })
+        tally["message_count"] += 1
+        if tally["capped_count"] < MAX_ENTRIES_PER_USER:
+            tally["capped_count"] += 1
+        if random.randrange(tally["message_count"]) == 0:
+            tally["sample_comment"] = message["comment_text"]
+
+    table = UserTally.__table__
+    stmt = pg_insert(table).values(list(batch.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["session_id", "username"],
+        set_={
+            "message_count": table.c.message_count + stmt.excluded.message_count,
+            "capped_count": func.least(table.c.capped_count + stmt.excluded.capped_count, MAX_ENTRIES_PER_USER),
+            # Merge two reservoirs: keep the batch's sample with probability batch / (stored + batch)
+            "sample_comment": case(
+                (
+                    func.random() * (table.c.message_count + stmt.excluded.message_count) < stmt.excluded.message_count,
+                    stmt.excluded.sample_comment,
+                ),
+                else_=table.c.sample_comment,
+            ),
+        }
+    )
     db.execute(stmt)
+
+
+def get_user_tallies(db, session: StreamSession) -> List[Dict]:
+    tallies = db.query(UserTally).filter(UserTally.session_id == session.id).all()
+    return [
+        {
+            "username": tally.username,
+            "entries": tally.capped_count,
+            "message_count": tally.message_count,
+            "comment_text": tally.sample_comment,
+        }
+        for tally in tallies
+        if tally.capped_count > 0
+    ]
+
+
+def aggregate_user_entries(
+    db,
+    session: StreamSession,
+    max_entries_per_user: int = MAX_ENTRIES_PER_USER,
+    since: Optional[datetime] = None
+) -> List[Dict]:
+    # One row per participant (GROUP BY in the DB instead of loading every message),
+    # with one comment sampled uniformly from all of the user's messages.
+    # 'since' restricts to messages published at/after it via the (session_id, published_at) index.
+    # count(*) rather than count(id): every referenced column is in ix_stream_messages_session_username,
+    # so the un-windowed aggregate can run as an index-only scan
+    message_count = func.count()
+    entry_count = func.least(message_count, max_entries_per_user)
+    comments = array_agg(StreamMessage.comment_text)
+    sample_index = 1 + cast(func.floor(func.random() * message_count), Integer)
+    query = (
+        db.query(
+            StreamMessage.username,
+            entry_count.label("entries"),
+            message_count.label("message_count"),
+            comments[sample_index].label("comment_text"),
+        )
+        .filter(StreamMessage.session_id == session.id)
+    )
+    if since is not None:
+        query = query.filter(StreamMessage.published_at >= since)
+    rows = query.group_by(StreamMessage.username).all()
+    return [
+        {
+            "username": row.username,
+            "entries": row.entries,
+            "message_count": row.message_count,
+            "comment_text": row.comment_text,
+        }
+        for row in rows
+    ]
+
+
+def get_channel_handle(db, handle: str) -> Optional[str]:
+    row = db.get(ChannelHandle, handle)
+    return row.channel_id if row else None
+
+
+def save_channel_handle(db, handle: str, channel_id: str) -> None:
+    stmt = pg_insert(ChannelHandle.__table__).values(handle=handle, channel_id=channel_id, resolved_at=datetime.utcnow())
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["handle"],
+        set_={"channel_id": stmt.excluded.channel_id, "resolved_at": stmt.excluded.resolved_at}
+    ))
     db.commit()
@@ -1,5 +1,8 @@
+import asyncio
 import os
 import requests
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
@@ -19,27 +22,88 @@ from app.models.raffle import (
     ChannelStreamsResponse,
     ChannelStats,
     CollectorSetSessionRequest,
-    CollectorStatusResponse
+    CollectorStatusResponse,
+    CollectorChatsResponse
     ,LiveChatIdRequest
     ,LiveChatIdResponse
 )
 from app.api.youtube_api import YouTubeAPI
+from app.api.async_youtube_api import AsyncYouTubeAPI
 from app.db import (
     init_db,
     get_db_session,
+    get_async_db_session,
+    async_engine,
     get_current_stream_session,
-    clear_stream_data,
+    get_stream_session,
+    retire_stream_session,
+    purge_retired_sessions,
+    precreate_session_partitions,
+    COLLECTOR_ORIGIN,
     get_or_create_stream_session,
-    StreamMessage
+    aggregate_user_entries,
+    get_user_tallies,
+    get_channel_handle,
+    save_channel_handle
 )
-from app.services.raffle import pick_winner
+from app.services.raffle import pick_winners
+from app.services.cache import SingleFlightCache
+from app.services.executors import run_db_io, run_youtube_io, shutdown_executors, timed_stage, youtube_executor
 from app.services.live_chat_collector import LiveChatCollector
 from app.utils.youtube import extract_video_id
 
+def _maintain_stream_sessions_once() -> None:
+    db = get_db_session()
+    try:
+        # Partitions for upcoming sessions are created here, off the request path
+        created = precreate_session_partitions(db)
+        if created:
+            print("TEMP: Pre-created stream_messages partitions:", created)
+        purged = purge_retired_sessions(db)
+        if purged:
+            print("TEMP: Purged retired stream sessions:", purged)
+    finally:
+        db.close()
+
+
+async def _maintain_stream_sessions_loop() -> None:
+    interval = float(os.getenv("SESSION_PURGE_INTERVAL_SECONDS", "300"))
+    while True:
+        try:
+            await run_db_io("maintain_stream_sessions", _maintain_stream_sessions_once)
+        except Exception as e:
+            print("TEMP: Stream session maintenance failed:", str(e))
+        await asyncio.sleep(interval)
+
+
+def get_default_channel_url() -> str:
+    return os.getenv("CHANNEL_URL") or "https://www.youtube.com/@prodiscus_official"
+
+
+def _warm_channel_stats() -> None:
+    # First page load then reads channel stats/podcasts from memory instead of waiting on YouTube
+    try:
+        get_youtube_api().get_channel_stats(channel_url=get_default_channel_url())
+    except Exception as e:
+        print("TEMP: Channel stats warm-up failed:", str(e))
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    purge_task = asyncio.create_task(_maintain_stream_sessions_loop())
+    if youtube_api_key:
+        youtube_executor.submit(_warm_channel_stats)
     yield
+    purge_task.cancel()
+    if collector is not None:
+        # Flush buffered messages and checkpoints before the engine and executors go away
+        await collector.aclose()
+    if async_youtube_api is not None:
+        await async_youtube_api.aclose()
+    if async_engine is not None:
+        await async_engine.dispose()
+    shutdown_executors()
 
 # Initialize FastAPI app
 app = FastAPI(title="RAFFLERi", description="Comment Raffle System", lifespan=lifespan)
@@ -56,33 +120,69 @@ def render_template(template_name: str, context: dict) -> str:
 # Initialize API clients (will be created lazily or raise error on first use)
 youtube_api_key = os.getenv("YOUTUBE_API_KEY")
 youtube_api = None
+async_youtube_api = None
 collector = None
 
+def require_youtube_api_key() -> str:
+    if not youtube_api_key:
+        raise HTTPException(
+            status_code=500,
+            detail="YOUTUBE_API_KEY environment variable is required. Please set it in your .env file or environment variables."
+        )
+    return youtube_api_key
+
+
+def _load_channel_handle(handle: str):
+    db = get_db_session()
+    try:
+        return get_channel_handle(db, handle)
+    finally:
+        db.close()
+
+
+def _save_channel_handle(handle: str, channel_id: str) -> None:
+    db = get_db_session()
+    try:
+        save_channel_handle(db, handle, channel_id)
+    finally:
+        db.close()
+
+
 def get_youtube_api():
     """Get YouTube API client, raising error if API key is missing."""
     global youtube_api
     if youtube_api is None:
-        if not youtube_api_key:
-            raise HTTPException(
-                status_code=500,
-                detail="YOUTUBE_API_KEY environment variable is required. Please set it in your .env file or environment variables."
-            )
+        require_youtube_api_key()
         podcast_playlist_id = os.getenv("PODCAST_PLAYLIST_ID") or "PLTigWTFUFrepryTKKY2Kua5iEYXcCnnEK"
-        youtube_api = YouTubeAPI(youtube_api_key, podcast_playlist_id=podcast_playlist_id)
+        youtube_api = YouTubeAPI(
+            youtube_api_key,
+            podcast_playlist_id=podcast_playlist_id,
+            # Handle resolutions persist in the channel_handles table across restarts
+            load_channel_handle=_load_channel_handle,
+            save_channel_handle=_save_channel_handle
+        )
     return youtube_api
 
 
+def get_async_youtube_api() -> AsyncYouTubeAPI:
+    """Get asyncio-native YouTube API client (used by the collector and async handlers)."""
+    global async_youtube_api
+    if async_youtube_api is None:
+        async_youtube_api = AsyncYouTubeAPI(require_youtube_api_key())
+    return async_youtube_api
+
+
 def get_collector() -> LiveChatCollector:
     global collector
     if collector is None:
-        collector = LiveChatCollector(get_youtube_api())
+        collector = LiveChatCollector(get_async_youtube_api())
     return collector
 
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     """Serve the main HTML page."""
-    channel_url = os.getenv("CHANNEL_URL") or "https://www.youtube.com/@prodiscus_official"
+    channel_url = get_default_channel_url()
     html_content = render_template("index.html", {"request": request, "channel_url": channel_url})
     return HTMLResponse(content=html_content)
 
@@ -106,81 +206,98 @@ async def youtube_raffle(request: RaffleRequest):
     Run a raffle for YouTube live chat messages.
     
     Args:
-        request: RaffleRequest with video_url
+        request: RaffleRequest with video_url, number of winners and optional time window
         
     Returns:
-        RaffleResponse with winner (including comment text) and statistics
+        RaffleResponse with winner(s) (including comment text) and statistics
     """
-    import asyncio
     try:
-        # Run the blocking API call in a thread pool to avoid blocking the event loop
-        loop = asyncio.get_event_loop()
-        api = get_youtube_api()
-
-        def raffle_from_db_or_fallback():
-            db = get_db_session()
+        # Write out anything the collector is still buffering so the draw sees every message
+        if collector is not None:
             try:
-                current_session = get_current_stream_session(db)
-                if current_session:
-                    rows = (
-                        db.query(StreamMessage)
-                        .filter(StreamMessage.session_id == current_session.id)
-                        .all()
-                    )
-                    if rows:
-                        user_data = {}
-                        for row in rows:
-                            username = row.username
-                            comment_text = row.comment_text
-                            key = f"user_{username}"
-                            if key not in user_data:
-                                user_data[key] = {"username": username, "count": 0, "comments": []}
-                            if user_data[key]["count"] < 5:
-                                user_data[key]["count"] += 1
-                                user_data[key]["comments"].append(comment_text)
-
-                        entries = []
-                        user_comments_map = {}
-                        # Build entries (import model locally to avoid import cycles)
-                        from app.models.raffle import RaffleEntry as EntryModel
-                        for _, info in user_data.items():
-                            if info["count"] > 0:
-                                entries.append(EntryModel(
-                                    platform="youtube",
-                                    user_id=None,
-                                    username=info["username"],
-                                    entries=info["count"],
-                                    comment_text=None
-                                ))
-                                user_comments_map[info["username"]] = info["comments"]
-
-                        total_comments = len(rows)
-                        return entries, user_comments_map, total_comments
-                return api.get_user_entries(request.video_url)
-            finally:
-                db.close()
-
-        entries, user_comments_map, total_comments = await loop.run_in_executor(None, raffle_from_db_or_fallback)
-        
+                await collector.flush()
+            except Exception as e:
+                print("TEMP: Pre-draw collector flush failed:", str(e))
+
+        # Time-window raffle: only messages published in the last N minutes count
+        since = None
+        if request.window_minutes:
+            since = datetime.utcnow() - timedelta(minutes=request.window_minutes)
+
+        # Live pool maintained by the collector: draw in-process without touching the DB
+        # (the pool covers the whole stream, so windowed draws go to the indexed DB query)
+        live_pool = collector.get_pool() if collector and since is None else None
+        if live_pool is not None and len(live_pool) > 0:
+            winners = live_pool.draw_winners(request.winners)
+            return RaffleResponse(
+                winner=winners[0],
+                winners=winners,
+                total_comments=live_pool.total_messages,
+                total_participants=len(live_pool),
+                platform="youtube"
+            )
+
+        def raffle_rows_from_db(db):
+            current_session = get_current_stream_session(db)
+            if not current_session:
+                return None
+            if since is not None:
+                # Index-range scan on (session_id, published_at), grouped per user
+                return aggregate_user_entries(db, current_session, since=since)
+            # Pre-aggregated tallies (one row per participant); sessions recorded
+            # before tallies existed fall back to a GROUP BY over their messages.
+            return get_user_tallies(db, current_session) or aggregate_user_entries(db, current_session)
+
+        with timed_stage("raffle.db_rows"):
+            async with get_async_db_session() as db:
+                user_rows = await db.run_sync(raffle_rows_from_db)
+
+        # A windowed draw over a stored session answers from the DB even when the window is empty
+        # (404 below) instead of re-reading the whole chat history from YouTube
+        if user_rows or (user_rows is not None and since is not None):
+            entries = []
+            user_comments_map = {}
+            # Build entries (import model locally to avoid import cycles)
+            from app.models.raffle import RaffleEntry as EntryModel
+            for info in user_rows:
+                entries.append(EntryModel(
+                    platform="youtube",
+                    user_id=None,
+                    username=info["username"],
+                    entries=info["entries"],
+                    comment_text=None
+                ))
+                if info["comment_text"] is not None:
+                    user_comments_map[info["username"]] = info["comment_text"]
+            total_comments = sum(info["message_count"] for info in user_rows)
+        else:
+            api = get_youtube_api()
+            entries, user_comments_map, total_comments = await run_youtube_io(
+                "raffle.fetch_chat", api.get_user_entries, request.video_url, since=since
+            )
+
         if not entries:
             raise HTTPException(
                 status_code=404,
                 detail="No live chat messages found for this stream"
             )
         
-        # Pick winner (with comment text)
-        winner = pick_winner(entries, user_comments_map)
+        # Pick distinct winners (with comment text) from the single aggregation pass
+        winners = pick_winners(entries, request.winners, user_comments_map)
         
         # Calculate statistics
         total_participants = len(entries)
         
         return RaffleResponse(
-            winner=winner,
+            winner=winners[0],
+            winners=winners,
             total_comments=total_comments,
             total_participants=total_participants,
             platform="youtube"
         )
     
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except requests.exceptions.RequestException as e:
@@ -202,7 +319,9 @@ async def youtube_channel(request: ChannelRequest):
     """
     try:
         api = get_youtube_api()
-        result = api.get_active_live_stream(
+        result = await run_youtube_io(
+            "channel.active_live_stream",
+            api.get_active_live_stream,
             channel_url=request.channel_url,
             channel_id=request.channel_id
         )
@@ -228,6 +347,10 @@ async def youtube_channel(request: ChannelRequest):
         raise HTTPException(status_code=500, detail=f"Error checking channel: {str(e)}")
 
 
+# Every page load hits channel/streams; viewers arriving together share one upstream lookup
+channel_streams_cache = SingleFlightCache(ttl_seconds=float(os.getenv("CHANNEL_STREAMS_CACHE_SECONDS", "15")))
+
+
 @app.post("/api/youtube/channel/streams", response_model=ChannelStreamsResponse)
 async def youtube_channel_streams(request: ChannelRequest):
     """
@@ -239,29 +362,38 @@ async def youtube_channel_streams(request: ChannelRequest):
     Returns:
         ChannelStreamsResponse with list of active streams
     """
+    cache_key = (request.channel_url, request.channel_id)
+    return await channel_streams_cache.get_or_load(cache_key, lambda: _load_channel_streams(request))
+
+
+async def _load_channel_streams(request: ChannelRequest) -> ChannelStreamsResponse:
     from app.models.raffle import StreamInfo
     
     db = None
     try:
         api = get_youtube_api()
-        db = get_db_session()
-        current_session = get_current_stream_session(db)
+        db = get_async_db_session()
+        with timed_stage("streams.load_session"):
+            current_session = await db.run_sync(get_current_stream_session)
         streams = []
         
         if current_session and current_session.live_chat_id and current_session.video_url and current_session.video_id:
             expected_channel_id = None
             if request.channel_url:
-                expected_channel_id = api.resolve_channel_id_from_url(request.channel_url)
+                expected_channel_id = await run_youtube_io(
+                    "streams.resolve_channel", api.resolve_channel_id_from_url, request.channel_url
+                )
 
             still_active = False
             try:
-                meta = api.get_video_live_metadata(current_session.video_id)
+                with timed_stage("streams.check_cached_stream"):
+                    meta = await get_async_youtube_api().get_video_live_metadata(current_session.video_id)
                 is_live = meta.get("live_broadcast_content") == "live"
                 active_live_chat_id = meta.get("active_live_chat_id")
                 video_channel_id = meta.get("channel_id")
 
                 if expected_channel_id and video_channel_id and video_channel_id != expected_channel_id:
-                    print("TEMP: Cached stream is live but belongs to another channel; clearing DB")
+                    print("TEMP: Cached stream is live but belongs to another channel; retiring session")
                     still_active = False
                 else:
                     still_active = bool(is_live and active_live_chat_id and active_live_chat_id == current_session.live_chat_id)
@@ -277,25 +409,32 @@ async def youtube_channel_streams(request: ChannelRequest):
                     'title': "Live Stream"
                 }]
             else:
-                print("TEMP: Cached live chat invalid/offline, clearing stored data")
-                clear_stream_data(db)
+                print("TEMP: Cached live chat invalid/offline, retiring stored session")
+                await db.run_sync(retire_stream_session, current_session)
+                if collector is not None:
+                    collector.stop(current_session.live_chat_id)
         
         if not streams:
             print("TEMP: No cached live chat, running YouTube channel search for", request.channel_url or request.channel_id)
-            streams = api.get_active_live_streams(
+            streams = await run_youtube_io(
+                "streams.search_live",
+                api.get_active_live_streams,
                 channel_url=request.channel_url,
                 channel_id=request.channel_id
             )
-            if streams:
-                first_stream = streams[0]
-                get_or_create_stream_session(
-                    db,
+            # A live stream with chat disabled has no live chat id to store a session for
+            first_stream = next((stream for stream in streams if stream['live_chat_id']), None)
+            if first_stream:
+                await db.run_sync(
+                    get_or_create_stream_session,
                     first_stream['live_chat_id'],
                     reset_on_new_live_chat=True,
                     video_id=first_stream['video_id'],
                     video_url=first_stream['video_url']
                 )
-        channel_stats_data = api.get_channel_stats(
+        channel_stats_data = await run_youtube_io(
+            "streams.channel_stats",
+            api.get_channel_stats,
             channel_url=request.channel_url,
             channel_id=request.channel_id
         )
@@ -325,18 +464,20 @@ async def youtube_channel_streams(request: ChannelRequest):
         raise HTTPException(status_code=500, detail=f"Error fetching channel streams: {str(e)}")
     finally:
         if db:
-            db.close()
+            await db.close()
 
 
 @app.post("/api/youtube/livechatid", response_model=LiveChatIdResponse)
 async def youtube_livechatid(request: LiveChatIdRequest):
-    api = get_youtube_api()
+    api = get_async_youtube_api()
     video_id = extract_video_id(request.video_url)
     if not video_id:
         raise HTTPException(status_code=400, detail="Invalid video URL")
-    if not api.check_if_live(video_id):
+    # One videos.list call gives both live status and the active chat id
+    meta = await api.get_video_live_metadata(video_id)
+    if meta.get("live_broadcast_content") != "live":
         raise HTTPException(status_code=400, detail="Video is not live")
-    live_chat_id = api.get_live_chat_id(video_id)
+    live_chat_id = meta.get("active_live_chat_id")
     if not live_chat_id:
         raise HTTPException(status_code=404, detail="No active live chat found")
     return LiveChatIdResponse(video_id=video_id, live_chat_id=live_chat_id)
@@ -344,32 +485,34 @@ async def youtube_livechatid(request: LiveChatIdRequest):
 
 @app.post("/api/collector/set_session")
 async def collector_set_session(request: CollectorSetSessionRequest):
-    # Stop collector first so we don't fight over DB locks while clearing/resetting
-    try:
-        get_collector().stop()
-    except Exception:
-        pass
-    db = get_db_session()
-    try:
+    def apply_session(db) -> Tuple[Optional[str], bool]:
+        """Point the current session at request.live_chat_id; returns (retired live chat id, session changed)."""
+        retired_live_chat_id = None
+        changed = False
         current_session = get_current_stream_session(db)
         # If main page is setting session and the existing session came from a different place/channel,
-        # clear so main always uses its own stream.
+        # retire it so main always uses its own stream.
         if current_session and request.origin == "main":
             if (current_session.origin and current_session.origin != "main") or (
                 current_session.channel_url and request.channel_url and current_session.channel_url != request.channel_url
             ):
-                print("TEMP: Main page session mismatch, clearing stored data")
-                clear_stream_data(db)
+                print("TEMP: Main page session mismatch, retiring stored session")
+                retire_stream_session(db, current_session)
+                retired_live_chat_id = current_session.live_chat_id
                 current_session = None
+                changed = True
 
         # If testing is trying to override an existing main session, refuse.
         if current_session and request.origin == "testing" and current_session.origin == "main":
             raise HTTPException(status_code=409, detail="Main session active; testing will not override it.")
 
         if not current_session or current_session.live_chat_id != request.live_chat_id:
-            print("TEMP: Setting new session, clearing old data")
-            clear_stream_data(db)
-            get_or_create_stream_session(
+            # Old session data stays until the background purge; switching is just a row update
+            print("TEMP: Setting new session, retiring old session")
+            if current_session:
+                retire_stream_session(db, current_session)
+                retired_live_chat_id = current_session.live_chat_id
+            current_session = get_or_create_stream_session(
                 db,
                 request.live_chat_id,
                 reset_on_new_live_chat=False,
@@ -378,18 +521,26 @@ async def collector_set_session(request: CollectorSetSessionRequest):
                 origin=request.origin,
                 channel_url=request.channel_url
             )
+            changed = True
         else:
-            # Same live chat: just ensure metadata is up to date
-            print("TEMP: Session unchanged, not clearing data")
-            from app.db import update_stream_session
-            update_stream_session(db, current_session, video_id=request.video_id, video_url=request.video_url)
-            current_session.origin = request.origin
-            current_session.channel_url = request.channel_url
-            db.commit()
-    finally:
-        db.close()
-    # Auto-start collector so UI doesn't depend on a separate call
+            print("TEMP: Session unchanged, keeping data")
+        # Ensure metadata is up to date (also for a reused, previously retired session)
+        from app.db import update_stream_session
+        current_session.origin = request.origin
+        current_session.channel_url = request.channel_url
+        update_stream_session(db, current_session, video_id=request.video_id, video_url=request.video_url)
+        return retired_live_chat_id, changed
+
+    with timed_stage("set_session.db"):
+        async with get_async_db_session() as db:
+            retired_live_chat_id, changed = await db.run_sync(apply_session)
+    if changed:
+        # Don't serve channel/streams responses computed before the switch
+        channel_streams_cache.invalidate()
     try:
+        if retired_live_chat_id and retired_live_chat_id != request.live_chat_id:
+            get_collector().stop(retired_live_chat_id)
+        # Auto-start collector so UI doesn't depend on a separate call
         get_collector().start(request.live_chat_id)
     except Exception as e:
         print("TEMP: Failed to auto-start collector:", str(e))
@@ -398,38 +549,84 @@ async def collector_set_session(request: CollectorSetSessionRequest):
 
 @app.post("/api/collector/start")
 async def collector_start():
-    db = get_db_session()
-    try:
-        current_session = get_current_stream_session(db)
-        if not current_session:
-            raise HTTPException(status_code=404, detail="No active stream session in DB")
-        get_collector().start(current_session.live_chat_id)
-        return {"ok": True}
-    finally:
-        db.close()
+    async with get_async_db_session() as db:
+        current_session = await db.run_sync(get_current_stream_session)
+    if not current_session:
+        raise HTTPException(status_code=404, detail="No active stream session in DB")
+    get_collector().start(current_session.live_chat_id)
+    return {"ok": True}
 
 
 @app.post("/api/collector/stop")
 async def collector_stop():
-    get_collector().stop()
+    # Stops the main page's chat only; chats started via /api/collector/chats keep running
+    live_chat_id = get_collector().status().get("live_chat_id")
+    if live_chat_id:
+        get_collector().stop(live_chat_id)
     return {"ok": True}
 
 
-@app.get("/api/collector/status", response_model=CollectorStatusResponse)
-async def collector_status():
-    state = get_collector().status()
-    db = get_db_session()
-    try:
-        current_session = get_current_stream_session(db)
-        if current_session:
-            total_comments = db.query(StreamMessage).filter(StreamMessage.session_id == current_session.id).count()
-        else:
-            total_comments = 0
-    finally:
-        db.close()
+def _chat_status_response(state: dict, total_comments: int) -> CollectorStatusResponse:
     return CollectorStatusResponse(
         collecting=bool(state.get("collecting")),
         live_chat_id=state.get("live_chat_id"),
         total_comments=total_comments,
         last_error=state.get("last_error")
-    )
\ No newline at end of file
+    )
+
+
+@app.get("/api/collector/status", response_model=CollectorStatusResponse)
+async def collector_status():
+    state = get_collector().status()
+    # O(1): counter published by the collector, else the session's maintained total_comments
+    total_comments = state.get("total_comments")
+    if total_comments is None:
+        async with get_async_db_session() as db:
+            current_session = await db.run_sync(get_current_stream_session)
+        total_comments = current_session.total_comments if current_session else 0
+    return _chat_status_response(state, total_comments)
+
+
+@app.get("/api/collector/chats", response_model=CollectorChatsResponse)
+async def collector_chats():
+    """List every chat the collector is polling."""
+    states = get_collector().statuses()
+    chats = []
+    async with get_async_db_session() as db:
+        for state in states:
+            total_comments = state.get("total_comments")
+            if total_comments is None:
+                session = await db.run_sync(get_stream_session, state["live_chat_id"])
+                total_comments = session.total_comments if session else 0
+            chats.append(_chat_status_response(state, total_comments))
+    return CollectorChatsResponse(chats=chats)
+
+
+@app.post("/api/collector/chats/{live_chat_id}/start")
+async def collector_chat_start(live_chat_id: str):
+    """Start polling an additional chat alongside the main session."""
+    async with get_async_db_session() as db:
+        await db.run_sync(
+            get_or_create_stream_session, live_chat_id, reset_on_new_live_chat=False, origin=COLLECTOR_ORIGIN
+        )
+    get_collector().start(live_chat_id, primary=False)
+    return {"ok": True}
+
+
+@app.post("/api/collector/chats/{live_chat_id}/stop")
+async def collector_chat_stop(live_chat_id: str):
+    get_collector().stop(live_chat_id)
+    return {"ok": True}
+
+
+@app.get("/api/collector/chats/{live_chat_id}/status", response_model=CollectorStatusResponse)
+async def collector_chat_status(live_chat_id: str):
+    state = get_collector().status(live_chat_id)
+    total_comments = state.get("total_comments")
+    if total_comments is None:
+        async with get_async_db_session() as db:
+            session = await db.run_sync(get_stream_session, live_chat_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="No stream session for this live chat")
+        total_comments = session.total_comments
+    return _chat_status_response(state, total_comments)
@@ -15,11 +15,13 @@ class RaffleRequest(BaseModel):
     """Request model for raffle endpoint."""
     video_url: str
     winners: int = Field(default=1, ge=1, description="Number of winners (defaults to 1)")
+    window_minutes: Optional[int] = Field(default=None, ge=1, description="Only count messages from the last N minutes")
 
 
 class RaffleResponse(BaseModel):
     """Response model for raffle endpoint."""
-    winner: RaffleEntry
+    winner: RaffleEntry  # First drawn winner (kept for single-winner clients)
+    winners: List[RaffleEntry] = Field(default_factory=list)  # All distinct winners, in draw order
     total_comments: int  # Actual number of comments/messages fetched
     total_participants: int
     platform: str
@@ -83,6 +85,10 @@ class CollectorStatusResponse(BaseModel):
     last_error: Optional[str] = None
 
 
+class CollectorChatsResponse(BaseModel):
+    chats: List[CollectorStatusResponse]
+
+
 class LiveChatIdRequest(BaseModel):
     video_url: str
 
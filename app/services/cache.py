@@ -0,0 +1,177 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlightCache:
+    """
+    Short-TTL result cache with request coalescing for async loaders.
+
+    Concurrent callers for the same key share one in-flight load instead of
+    each hitting the upstream; a successful result is then served from memory
+    until it is ttl_seconds old. Failures are not cached, so the next caller
+    retries. Must be used from a single event loop.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        """
+        Initialize an empty cache.
+
+        Args:
+            ttl_seconds: How long a loaded result is served before reloading (0 disables caching,
+                concurrent callers are still coalesced)
+        """
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}  # key -> (expires_at, value)
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key, joining or starting a load if there is none.
+
+        Args:
+            key: Cache key
+            loader: Zero-argument coroutine function producing the value
+
+        Returns:
+            Cached or freshly loaded value (exceptions from the loader propagate to every waiter)
+        """
+        cached = self._results.get(key)
+        if cached is not None:
+            expires_at, value = cached
+            if time.monotonic() < expires_at:
+                return value
+            del self._results[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            # Own task, so one caller disconnecting doesn't cancel the load for the others
+            task = asyncio.get_running_loop().create_task(loader())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done, key=key: self._store(key, done))
+        return await asyncio.shield(task)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Forget the cached result for key (every key when None); loads already running aren't stored."""
+        if key is None:
+            self._results.clear()
+            self._in_flight.clear()
+        else:
+            self._results.pop(key, None)
+            self._in_flight.pop(key, None)
+
+    def _store(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is not task:
+            return  # Invalidated while loading: its result may predate the change
+        del self._in_flight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if self.ttl_seconds > 0:
+            self._results[key] = (time.monotonic() + self.ttl_seconds, task.result())
+
+
+class StaleWhileRevalidateCache:
+    """
+    Thread-safe cache for slow-changing upstream data (for the sync API client).
+
+    Once a key has been loaded, get() always answers from memory; when the
+    value is older than ttl_seconds it is still returned, and a refresh is
+    started on the executor in the background. Only the very first load of a
+    key blocks, and concurrent first callers share it. A failed background
+    refresh keeps serving the previous value.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, executor: Executor):
+        """
+        Initialize an empty cache.
+
+        Args:
+            name: Data kind, used in log lines
+            ttl_seconds: Age after which a value is refreshed in the background
+            executor: Executor that runs background refreshes
+        """
+        self.name = name
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}  # key -> (loaded_at, value)
+        self._loading: Dict[Hashable, Future] = {}
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the value for key, loading it on first use.
+
+        Args:
+            key: Cache key
+            loader: Zero-argument function fetching a fresh value
+
+        Returns:
+            Cached (possibly stale) or freshly loaded value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                loaded_at, value = entry
+                if time.monotonic() - loaded_at >= self.ttl_seconds and key not in self._loading:
+                    try:
+                        self._loading[key] = self._executor.submit(self._refresh, key, loader)
+                    except RuntimeError:
+                        pass  # Executor shut down (app stopping): keep serving the stale value
+                return value
+            future = self._loading.get(key)
+            first_caller = future is None
+            if first_caller:
+                future = Future()
+                self._loading[key] = future
+        if not first_caller:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._loading.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        try:
+            value = loader()
+            with self._lock:
+                self._entries[key] = (time.monotonic(), value)
+        except Exception as e:
+            print(f"TEMP: Background refresh of {self.name} failed, serving stale value:", str(e))
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+
+class LRUCache:
+    """Small thread-safe least-recently-used map for values that never go stale."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max(1, max_size)
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
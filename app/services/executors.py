@@ -0,0 +1,62 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+# Separate, sized pools so a burst of slow YouTube calls can't starve DB work (and vice versa),
+# and neither competes with the event loop's default executor.
+youtube_executor = ThreadPoolExecutor(
+    max_workers=max(1, int(os.getenv("YOUTUBE_IO_WORKERS", "8"))),
+    thread_name_prefix="youtube-io"
+)
+db_executor = ThreadPoolExecutor(
+    max_workers=max(1, int(os.getenv("DB_IO_WORKERS", "8"))),
+    thread_name_prefix="db-io"
+)
+
+
+async def run_youtube_io(stage: str, func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking YouTube API call on the YouTube I/O pool, logging its timing as 'stage'."""
+    return await _run_in(youtube_executor, stage, func, *args, **kwargs)
+
+
+async def run_db_io(stage: str, func: Callable, *args, **kwargs) -> Any:
+    """Run blocking (sync SQLAlchemy) DB work on the DB I/O pool, logging its timing as 'stage'."""
+    return await _run_in(db_executor, stage, func, *args, **kwargs)
+
+
+async def _run_in(executor: ThreadPoolExecutor, stage: str, func: Callable, *args, **kwargs) -> Any:
+    submitted = time.perf_counter()
+    started = []
+
+    def call():
+        started.append(time.perf_counter())
+        return func(*args, **kwargs)
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+    finally:
+        finished = time.perf_counter()
+        # Queue wait shows a saturated pool; run time shows a slow upstream
+        if started:
+            print(
+                f"TEMP: stage {stage}: waited {(started[0] - submitted) * 1000:.1f} ms, "
+                f"ran {(finished - started[0]) * 1000:.1f} ms"
+            )
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """Log how long an inline (async) stage took."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        print(f"TEMP: stage {stage}: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+def shutdown_executors() -> None:
+    youtube_executor.shutdown(wait=False, cancel_futures=True)
+    db_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,93 +1,284 @@
-import threading
-import threading
-import time
+import asyncio
+import heapq
+import itertools
 import os
-from typing import Dict, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
-from app.api.youtube_api import YouTubeAPI
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.api.async_youtube_api import AsyncYouTubeAPI
 from app.db import (
-    add_messages,
+    aggregate_user_entries,
+    ensure_session_partition,
     get_db_session,
-    StreamMessage,
+    get_user_tallies,
     get_or_create_stream_session,
-    update_stream_session
+    write_message_batch
 )
+from app.services.executors import run_db_io
+from app.services.live_raffle_pool import LiveRafflePool
+from app.services.message_buffer import MessageWriteBuffer
+from app.utils.youtube import parse_youtube_timestamp
+
+
+class _ChatState:
+    """Per-chat collector state (DB session, page token, write buffer, live pool, status)."""
+
+    def __init__(self, live_chat_id: str, generation: int):
+        self.live_chat_id = live_chat_id
+        self.generation = generation
+        self.active = True
+        self.in_flight = False
+        self.db = None
+        self.session = None
+        self.page_token: Optional[str] = None
+        self.resume_after: Optional[datetime] = None
+        self.buffer = MessageWriteBuffer()
+        self.db_lock = asyncio.Lock()  # Serializes use of this chat's DB session
+        self.pool = LiveRafflePool()
+        self.pool_ready = False
+        # total_comments is published in-memory so status reads never count rows (None until loaded)
+        self.state: Dict = {"collecting": True, "live_chat_id": live_chat_id, "last_error": None, "total_comments": None}
 
 
 class LiveChatCollector:
-    """Polls live chat continuously and stores messages + nextPageToken into DB."""
+    """Polls many live chats from one scheduler, storing messages + nextPageToken into DB and feeding live raffle pools.
 
-    def __init__(self, api: YouTubeAPI):
+    A single asyncio task pops chats from a priority queue keyed by each chat's next due time
+    (from pollingIntervalMillis) and polls them with bounded concurrency. start/stop/status must be
+    called from the app's event loop; blocking DB work runs on the dedicated DB I/O pool.
+    """
+
+    def __init__(self, api: AsyncYouTubeAPI, max_concurrency: Optional[int] = None):
         self.api = api
-        self._lock = threading.Lock()
-        self._thread: Optional[threading.Thread] = None
-        self._stop_event: Optional[threading.Event] = None
-        self._state: Dict = {"collecting": False, "live_chat_id": None, "last_error": None}
-
-    def start(self, live_chat_id: str) -> None:
-        # Important: stop() must NOT be called while holding _lock (would deadlock).
-        with self._lock:
-            already_collecting_same = self._state["collecting"] and self._state["live_chat_id"] == live_chat_id
-        if already_collecting_same:
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("COLLECTOR_MAX_CONCURRENCY", "8"))
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_poll_seconds = float(os.getenv("COLLECTOR_MIN_POLL_SECONDS", "5"))
+        self._chats: Dict[str, _ChatState] = {}
+        self._queue: List[Tuple[float, int, str, int]] = []  # (due, seq, live_chat_id, generation)
+        self._seq = itertools.count()
+        self._generations = itertools.count(1)
+        self._primary: Optional[str] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._scheduler: Optional[asyncio.Task] = None
+        self._polls = set()
+
+    def start(self, live_chat_id: str, primary: bool = True) -> None:
+        """Start collecting a chat (other chats keep running).
+
+        The primary chat (the main page's session) is the default for status() and get_pool().
+        """
+        if primary:
+            self._primary = live_chat_id
+        chat = self._chats.get(live_chat_id)
+        if chat and chat.active:
             return
 
+        chat = _ChatState(live_chat_id, next(self._generations))
+        self._chats[live_chat_id] = chat
+        self._ensure_scheduler()
+        self._schedule(chat, 0.0)
+        print("TEMP: Collector started for", live_chat_id)
+
+    def stop(self, live_chat_id: Optional[str] = None) -> None:
+        """Stop one chat, or every chat when live_chat_id is None. Never blocks."""
+        chat_ids = [live_chat_id] if live_chat_id else list(self._chats)
+        for chat_id in chat_ids:
+            chat = self._chats.pop(chat_id, None)
+            if not chat:
+                continue
+            chat.active = False
+            chat.pool_ready = False
+            chat.state["collecting"] = False
+            # An in-flight poll flushes and closes its own DB session when it finishes
+            if not chat.in_flight:
+                self._close_chat_db(chat)
+            print("TEMP: Collector stopped for", chat_id)
+
+    async def aclose(self, timeout: Optional[float] = None) -> None:
+        """Stop every chat and wait for in-flight polls and final flushes (call before shutting down DB/executors)."""
+        if timeout is None:
+            timeout = float(os.getenv("COLLECTOR_SHUTDOWN_TIMEOUT_SECONDS", "30"))
         self.stop()
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # A finishing poll schedules its chat's final flush, so wait until no task is left
+        while self._polls:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                print("TEMP: Collector shutdown timed out with", len(self._polls), "tasks pending")
+                break
+            await asyncio.wait(list(self._polls), timeout=remaining)
 
-        with self._lock:
-            self._stop_event = threading.Event()
-            self._state = {"collecting": True, "live_chat_id": live_chat_id, "last_error": None}
-            self._thread = threading.Thread(target=self._run, args=(live_chat_id, self._stop_event), daemon=True)
-            self._thread.start()
-        print("TEMP: Collector started for", live_chat_id)
+    def status(self, live_chat_id: Optional[str] = None) -> Dict:
+        """Status of one chat (defaults to the primary chat)."""
+        live_chat_id = live_chat_id or self._primary
+        chat = self._chats.get(live_chat_id) if live_chat_id else None
+        if chat is None:
+            return {"collecting": False, "live_chat_id": live_chat_id, "last_error": None}
+        return dict(chat.state)
 
-    def stop(self) -> None:
-        thread = None
-        with self._lock:
-            if self._stop_event:
-                self._stop_event.set()
-            self._state["collecting"] = False
-            thread = self._thread
-        if thread and thread.is_alive():
-            thread.join(timeout=2.0)
-        print("TEMP: Collector stopped")
-
-    def status(self) -> Dict:
-        with self._lock:
-            return dict(self._state)
-
-    def _run(self, live_chat_id: str, stop_event: threading.Event) -> None:
-        db = None
-        try:
-            db = get_db_session()
-            session = get_or_create_stream_session(db, live_chat_id, reset_on_new_live_chat=False)
-            page_token = session.next_page_token
-            min_poll_seconds = float(os.getenv("COLLECTOR_MIN_POLL_SECONDS", "5"))
+    def statuses(self) -> List[Dict]:
+        return [dict(chat.state) for chat in self._chats.values()]
+
+    def get_pool(self, live_chat_id: Optional[str] = None) -> Optional[LiveRafflePool]:
+        """Live raffle pool for a collected chat (None until rebuilt from DB)."""
+        live_chat_id = live_chat_id or self._primary
+        chat = self._chats.get(live_chat_id) if live_chat_id else None
+        if chat and chat.active and chat.pool_ready:
+            return chat.pool
+        return None
+
+    async def flush(self, live_chat_id: Optional[str] = None) -> None:
+        """Write a chat's buffered messages now (e.g. right before a draw)."""
+        live_chat_id = live_chat_id or self._primary
+        chat = self._chats.get(live_chat_id) if live_chat_id else None
+        if chat and chat.session is not None:
+            await self._flush(chat)
+
+    def _ensure_scheduler(self) -> None:
+        if self._scheduler is None or self._scheduler.done():
+            self._wakeup = asyncio.Event()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._scheduler = asyncio.get_running_loop().create_task(self._run_scheduler())
 
-            while not stop_event.is_set():
+    def _schedule(self, chat: _ChatState, delay: float) -> None:
+        due = asyncio.get_running_loop().time() + delay
+        heapq.heappush(self._queue, (due, next(self._seq), chat.live_chat_id, chat.generation))
+        self._wakeup.set()
+
+    async def _run_scheduler(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due, _, chat_id, generation = self._queue[0]
+            delay = due - loop.time()
+            if delay > 0:
+                # Sleep until the earliest chat is due, or until a new chat is scheduled
+                self._wakeup.clear()
                 try:
-                    messages, next_page_token, polling_interval_ms = self.api.fetch_live_chat_page(
-                        live_chat_id=live_chat_id,
-                        page_token=page_token
-                    )
-                    if messages:
-                        add_messages(db, session, messages)
-
-                    page_token = next_page_token or page_token
-                    total_comments = db.query(StreamMessage).filter_by(session_id=session.id).count()
-                    update_stream_session(db, session, next_page_token=page_token, total_comments=total_comments)
-
-                    with self._lock:
-                        self._state["last_error"] = None
-                except Exception as e:
-                    with self._lock:
-                        self._state["last_error"] = str(e)
-                    polling_interval_ms = 5000
-
-                # Respect YouTube's recommended interval, but don't poll faster than min_poll_seconds.
-                sleep_sec = max(min_poll_seconds, (polling_interval_ms or 1000) / 1000.0)
-                time.sleep(sleep_sec)
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._queue)
+            chat = self._chats.get(chat_id)
+            if chat is None or chat.generation != generation or not chat.active:
+                continue  # Stale entry for a stopped/restarted chat
+
+            await self._semaphore.acquire()
+            chat.in_flight = True
+            task = loop.create_task(self._poll(chat))
+            self._polls.add(task)
+            task.add_done_callback(self._poll_done)
+
+    def _poll_done(self, task: asyncio.Task) -> None:
+        self._polls.discard(task)
+        self._semaphore.release()
+
+    async def _poll(self, chat: _ChatState) -> None:
+        polling_interval_ms = 5000
+        try:
+            if chat.session is None:
+                await self._open_chat(chat)
+            if chat.active:
+                polling_interval_ms = await self._poll_page(chat)
+                chat.state["last_error"] = None
+        except Exception as e:
+            chat.state["last_error"] = str(e)
+            polling_interval_ms = 5000
         finally:
-            if db:
-                db.close()
-            with self._lock:
-                self._state["collecting"] = False
+            chat.in_flight = False
+
+        if chat.active:
+            # Respect YouTube's recommended interval, but don't poll faster than min_poll_seconds.
+            self._schedule(chat, max(self.min_poll_seconds, (polling_interval_ms or 1000) / 1000.0))
+        else:
+            self._close_chat_db(chat)
+
+    async def _open_chat(self, chat: _ChatState) -> None:
+        async with chat.db_lock:
+            if chat.db is None:
+                chat.db = await run_db_io("collector.open_db", get_db_session)
+            session = await run_db_io("collector.load_session", get_or_create_stream_session, chat.db, chat.live_chat_id, False)
+            # The partition is normally pre-created; create it here (short lock_timeout) before the first write
+            await run_db_io("collector.ensure_partition", ensure_session_partition, chat.db, session)
+            chat.page_token = session.next_page_token
+            chat.resume_after = session.last_published_at
+            chat.state["total_comments"] = session.total_comments or 0
+
+            # DB is the durable source: rebuild the in-memory pool from stored tallies
+            user_rows = await run_db_io("collector.load_tallies", get_user_tallies, chat.db, session)
+            if not user_rows:
+                user_rows = await run_db_io("collector.aggregate", aggregate_user_entries, chat.db, session)
+            chat.pool.load(user_rows)
+            chat.session = session
+            chat.pool_ready = chat.active
+
+    async def _poll_page(self, chat: _ChatState) -> int:
+        if chat.buffer.full():
+            # Writes keep failing: retry them without fetching (and advancing the page token) further
+            await self._flush(chat)
+            return 5000
+        messages, next_page_token, polling_interval_ms = await self.api.fetch_live_chat_page(
+            live_chat_id=chat.live_chat_id,
+            page_token=chat.page_token
+        )
+        chat.page_token = next_page_token or chat.page_token
+        if chat.resume_after is not None:
+            # Skip messages already covered by the last checkpoint (same-instant ones are deduped on insert)
+            messages = [
+                message for message in messages
+                if (parse_youtube_timestamp(message.get("published_at")) or chat.resume_after) >= chat.resume_after
+            ]
+        # Write-behind: coalesce pages and commit once per N rows / T ms
+        chat.buffer.add(messages, chat.page_token)
+        if chat.buffer.should_flush():
+            await self._flush(chat)
+        return polling_interval_ms
+
+    async def _flush(self, chat: _ChatState) -> None:
+        async with chat.db_lock:
+            if chat.db is None or not chat.buffer.pending():
+                return
+            messages, page_token = chat.buffer.drain()
+            try:
+                # Messages, tallies, total_comments and page token in a single transaction
+                inserted = await run_db_io(
+                    "collector.write_batch", write_message_batch, chat.db, chat.session, messages, page_token
+                )
+            except Exception as e:
+                await run_db_io("collector.rollback", chat.db.rollback)
+                # Bad rows fail the same way on every retry; anything else (DB down) is retried
+                if not chat.buffer.requeue(messages, page_token, retryable=not isinstance(e, (DataError, IntegrityError))):
+                    print("TEMP: Dropping", len(messages), "unwritable messages for", chat.live_chat_id, str(e))
+                raise
+            chat.pool.add_messages(inserted)
+            chat.state["total_comments"] += len(inserted)
+
+    def _close_chat_db(self, chat: _ChatState) -> None:
+        if chat.db is not None:
+            task = asyncio.get_running_loop().create_task(self._finish_chat(chat))
+            self._polls.add(task)
+            task.add_done_callback(self._polls.discard)
+
+    async def _finish_chat(self, chat: _ChatState) -> None:
+        # Flush whatever is still buffered, then release the DB session
+        try:
+            await self._flush(chat)
+        except Exception as e:
+            print("TEMP: Final collector flush failed for", chat.live_chat_id, str(e))
+        async with chat.db_lock:
+            db, chat.db = chat.db, None
+            if db is not None:
+                await run_db_io("collector.close_db", db.close)
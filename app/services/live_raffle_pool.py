@@ -0,0 +1,160 @@
+import random
+import threading
+from typing import Dict, List, Optional
+
+from app.models.raffle import RaffleEntry
+
+
+class LiveRafflePool:
+    """
+    In-process weighted raffle pool fed by the live chat collector.
+
+    Participant weights live in a Fenwick (binary indexed) tree with a
+    username -> index map, so adding a message and drawing a winner are
+    both O(log n) and a draw never has to touch the database.
+    """
+
+    def __init__(self, max_entries_per_user: int = 5):
+        """
+        Initialize an empty pool.
+
+        Args:
+            max_entries_per_user: Maximum entries per user (default: 5)
+        """
+        self.max_entries_per_user = max_entries_per_user
+        self._lock = threading.Lock()
+        self._tree: List[int] = [0]  # 1-indexed Fenwick tree
+        self._weights: List[int] = []
+        self._usernames: List[str] = []
+        self._message_counts: List[int] = []
+        self._comments: List[Optional[str]] = []  # Size-1 comment reservoir per user
+        self._index: Dict[str, int] = {}
+        self.total_weight = 0
+        self.total_messages = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._usernames)
+
+    def load(self, user_rows: List[Dict]) -> None:
+        """
+        Rebuild the pool from aggregated rows (e.g. DB tallies after a restart).
+
+        Args:
+            user_rows: Dicts with username, entries, message_count and comment_text
+        """
+        with self._lock:
+            self._usernames = [row["username"] for row in user_rows]
+            self._weights = [min(row["entries"], self.max_entries_per_user) for row in user_rows]
+            self._message_counts = [row.get("message_count", row["entries"]) for row in user_rows]
+            self._comments = [row.get("comment_text") for row in user_rows]
+            self._index = {username: i for i, username in enumerate(self._usernames)}
+            self.total_weight = sum(self._weights)
+            self.total_messages = sum(self._message_counts)
+
+            # O(n) Fenwick construction: push each node's sum to its parent
+            tree = [0] + self._weights
+            for i in range(1, len(tree)):
+                parent = i + (i & -i)
+                if parent < len(tree):
+                    tree[parent] += tree[i]
+            self._tree = tree
+
+    def add_messages(self, messages: List[Dict]) -> None:
+        """
+        Count newly stored messages towards their authors' entries.
+
+        Args:
+            messages: Dicts with username and comment_text (duplicates already removed)
+        """
+        with self._lock:
+            for message in messages:
+                self.total_messages += 1
+                username = message.get("username", "Unknown")
+                index = self._index.get(username)
+                if index is None:
+                    index = self._append(username)
+                self._message_counts[index] += 1
+                if random.randrange(self._message_counts[index]) == 0:
+                    self._comments[index] = message.get("comment_text", "")
+                if self._weights[index] < self.max_entries_per_user:
+                    self._weights[index] += 1
+                    self._update(index, 1)
+
+    def draw_winners(self, count: int = 1) -> List[RaffleEntry]:
+        """
+        Draw distinct winners, weighted by entry count, without replacement.
+
+        Args:
+            count: Number of winners to draw (capped at number of participants)
+
+        Returns:
+            List of RaffleEntry winners with comment_text set
+
+        Raises:
+            ValueError: If the pool is empty
+        """
+        with self._lock:
+            if self.total_weight <= 0:
+                raise ValueError("Cannot pick winner from empty entries list")
+
+            drawn: List[int] = []
+            try:
+                while len(drawn) < count and self.total_weight > 0:
+                    index = self._find(random.randrange(self.total_weight))
+                    drawn.append(index)
+                    # Temporarily remove the winner so later draws are distinct
+                    self._update(index, -self._weights[index])
+            finally:
+                for index in drawn:
+                    self._update(index, self._weights[index])
+
+            winners = []
+            for index in drawn:
+                winners.append(RaffleEntry(
+                    platform="youtube",
+                    user_id=None,
+                    username=self._usernames[index],
+                    entries=self._weights[index],
+                    comment_text=self._comments[index]
+                ))
+            return winners
+
+    def _append(self, username: str) -> int:
+        index = len(self._usernames)
+        self._usernames.append(username)
+        self._weights.append(0)
+        self._message_counts.append(0)
+        self._comments.append(None)
+        self._index[username] = index
+        # A new node covers (i - lowbit(i), i]; its initial sum is that range of existing weights
+        position = index + 1
+        self._tree.append(self._prefix_sum(position - 1) - self._prefix_sum(position - (position & -position)))
+        return index
+
+    def _update(self, index: int, delta: int) -> None:
+        self.total_weight += delta
+        position = index + 1
+        while position < len(self._tree):
+            self._tree[position] += delta
+            position += position & -position
+
+    def _prefix_sum(self, position: int) -> int:
+        total = 0
+        while position > 0:
+            total += self._tree[position]
+            position -= position & -position
+        return total
+
+    def _find(self, target: int) -> int:
+        """Return the index whose cumulative weight range contains target (0 <= target < total)."""
+        position = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            next_position = position + step
+            if next_position < len(self._tree) and self._tree[next_position] <= target:
+                position = next_position
+                target -= self._tree[next_position]
+            step >>= 1
+        return position
+
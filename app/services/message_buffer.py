@@ -0,0 +1,112 @@
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class MessageWriteBuffer:
+    """
+    Write-behind buffer between the live chat collector and the DB.
+
+    Fetched pages are coalesced in memory and handed off as one batch once
+    max_rows messages are pending or the oldest pending page is max_delay_ms
+    old, so a busy chat commits once per batch instead of once per page.
+    """
+
+    def __init__(
+        self,
+        max_rows: Optional[int] = None,
+        max_delay_ms: Optional[int] = None,
+        max_held_rows: Optional[int] = None
+    ):
+        """
+        Initialize an empty buffer.
+
+        Args:
+            max_rows: Flush threshold in messages (default: COLLECTOR_FLUSH_ROWS or 1000)
+            max_delay_ms: Flush threshold in milliseconds (default: COLLECTOR_FLUSH_MS or 15000)
+            max_held_rows: Pending messages at which the buffer reports full() so the collector stops
+                fetching until a write succeeds (default: COLLECTOR_BUFFER_MAX_ROWS or 50000)
+        """
+        if max_rows is None:
+            max_rows = int(os.getenv("COLLECTOR_FLUSH_ROWS", "1000"))
+        if max_delay_ms is None:
+            max_delay_ms = int(os.getenv("COLLECTOR_FLUSH_MS", "15000"))
+        self.max_rows = max(1, max_rows)
+        self.max_delay_ms = max(0, max_delay_ms)
+        if max_held_rows is None:
+            max_held_rows = int(os.getenv("COLLECTOR_BUFFER_MAX_ROWS", "50000"))
+        self.max_held_rows = max(self.max_rows, max_held_rows)
+        self._messages: List[Dict] = []
+        self._page_token: Optional[str] = None
+        self._first_added_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def add(self, messages: List[Dict], next_page_token: Optional[str]) -> None:
+        """
+        Buffer one fetched page.
+
+        Args:
+            messages: Parsed messages from the page
+            next_page_token: Page token to checkpoint once these messages are written
+        """
+        if self._first_added_at is None:
+            self._first_added_at = time.monotonic()
+        self._messages.extend(messages)
+        if next_page_token:
+            self._page_token = next_page_token
+
+    def pending(self) -> bool:
+        return self._first_added_at is not None
+
+    def full(self) -> bool:
+        """True while writes are failing and max_held_rows messages are waiting (stop fetching)."""
+        return len(self._messages) >= self.max_held_rows
+
+    def should_flush(self) -> bool:
+        if not self.pending():
+            return False
+        if len(self._messages) >= self.max_rows:
+            return True
+        return (time.monotonic() - self._first_added_at) * 1000.0 >= self.max_delay_ms
+
+    def drain(self) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Take everything pending.
+
+        Returns:
+            Tuple of (buffered messages, latest page token to checkpoint)
+        """
+        messages, page_token = self._messages, self._page_token
+        self._messages = []
+        self._page_token = None
+        self._first_added_at = None
+        return messages, page_token
+
+    def requeue(self, messages: List[Dict], page_token: Optional[str], retryable: bool = True) -> bool:
+        """
+        Put a drained batch back in front after a failed write (it is retried on the next flush).
+
+        A batch that failed with a non-retryable error (bad data, which would fail the same
+        way forever) is dropped instead. Retryable failures (DB unreachable) never drop
+        rows; the collector stops fetching once full() instead. The page token is kept either way.
+
+        Args:
+            messages: The drained batch
+            page_token: The drained page token
+            retryable: False if writing this batch can never succeed
+
+        Returns:
+            True if the batch was requeued, False if it was dropped
+        """
+        if self._page_token is None:
+            self._page_token = page_token
+        if not retryable:
+            if self._first_added_at is None and not self._messages and self._page_token:
+                self._first_added_at = time.monotonic()  # Still checkpoint the token
+            return False
+        self._messages = messages + self._messages
+        if self._first_added_at is None:
+            self._first_added_at = time.monotonic()
+        return True
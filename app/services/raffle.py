@@ -1,54 +1,130 @@
+import heapq
+import math
 import random
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from app.models.raffle import RaffleEntry
 
 
-def build_weighted_pool(entries: List[RaffleEntry]) -> List[RaffleEntry]:
+class UserEntryAggregator:
     """
-    Build a weighted pool where each entry appears based on entry count.
-    
-    Args:
-        entries: List of RaffleEntry objects
-        
-    Returns:
-        List of RaffleEntry objects where each entry appears 'entries' times
+    Folds chat messages into per-user entry counts as they arrive.
+
+    Each user keeps a reservoir of size 1 for their comment (every message
+    replaces it with probability 1/message_count), so only one comment per
+    participant is held in memory regardless of how much they chat.
     """
-    pool = []
-    for entry in entries:
-        pool.extend([entry] * entry.entries)
-    return pool
 
+    def __init__(self, max_entries_per_user: int = 5):
+        """
+        Initialize an empty aggregator.
+
+        Args:
+            max_entries_per_user: Maximum entries per user (default: 5)
+        """
+        self.max_entries_per_user = max_entries_per_user
+        self.users: Dict[str, Dict] = {}
+        self.total_messages = 0
+
+    def add(self, username: str, comment_text: str) -> None:
+        """
+        Count one message towards its author's entries.
+
+        Args:
+            username: Message author display name
+            comment_text: Message text
+        """
+        self.total_messages += 1
+        user = self.users.get(username)
+        if user is None:
+            user = {'username': username, 'message_count': 0, 'entries': 0, 'comment_text': None}
+            self.users[username] = user
+        user['message_count'] += 1
+        if user['entries'] < self.max_entries_per_user:
+            user['entries'] += 1
+        if random.randrange(user['message_count']) == 0:
+            user['comment_text'] = comment_text
+
+    def add_messages(self, messages: List[Dict]) -> None:
+        """
+        Count a batch of message dicts (username + comment_text).
+
+        Args:
+            messages: List of message dictionaries
+        """
+        for message in messages:
+            self.add(message.get('username', 'Unknown'), message.get('comment_text', ''))
+
+    def to_entries(self, platform: str = 'youtube') -> Tuple[List[RaffleEntry], Dict[str, str]]:
+        """
+        Convert aggregated users into raffle entries.
 
-def pick_winner(
+        Args:
+            platform: Platform name stored on each entry
+
+        Returns:
+            Tuple of (List of RaffleEntry objects, Dict mapping username to sampled comment)
+        """
+        entries = []
+        user_comments_map: Dict[str, str] = {}
+        for user in self.users.values():
+            entries.append(RaffleEntry(
+                platform=platform,
+                user_id=None,
+                username=user['username'],
+                entries=user['entries'],
+                comment_text=None  # Will be set when winner is picked
+            ))
+            if user['comment_text'] is not None:
+                user_comments_map[user['username']] = user['comment_text']
+        return entries, user_comments_map
+
+
+def pick_winners(
     entries: List[RaffleEntry],
-    user_comments_map: Optional[Dict[str, List[str]]] = None
-) -> RaffleEntry:
+    count: int,
+    user_comments_map: Optional[Dict[str, str]] = None
+) -> List[RaffleEntry]:
     """
-    Pick one winner from the weighted raffle pool and assign a winning comment.
-    
+    Pick several distinct winners (weighted sampling without replacement).
+
+    Uses Efraimidis-Spirakis keyed sampling: each entry gets the key
+    log(u) / weight for a uniform u, and the 'count' largest keys win.
+    This is a single O(n log k) pass over the entries.
+
     Args:
         entries: List of RaffleEntry objects
-        user_comments_map: Optional dict mapping user_id/username to list of their comments
-        
+        count: Number of winners to pick (capped at number of entries)
+        user_comments_map: Optional dict mapping user_id/username to their sampled comment
+
     Returns:
-        Single RaffleEntry winner with comment_text set
-        
+        List of distinct RaffleEntry winners (in draw order) with comment_text set
+
     Raises:
-        ValueError: If entries list is empty
+        ValueError: If entries list is empty or count is less than 1
     """
     if not entries:
         raise ValueError("Cannot pick winner from empty entries list")
-    
-    pool = build_weighted_pool(entries)
-    winner = random.choice(pool)
-    
-    # Set winning comment text if available
-    if user_comments_map:
-        lookup_key = winner.user_id if winner.user_id else winner.username
-        if lookup_key in user_comments_map:
-            comments = user_comments_map[lookup_key]
-            if comments:
-                # Pick a random comment from this user's comments
-                winner.comment_text = random.choice(comments)
-    
-    return winner
+    if count < 1:
+        raise ValueError("Number of winners must be at least 1")
+
+    keyed = (
+        (math.log(1.0 - random.random()) / entry.entries, index)
+        for index, entry in enumerate(entries)
+    )
+    winners = [entries[index] for _, index in heapq.nlargest(count, keyed)]
+    for winner in winners:
+        _assign_winning_comment(winner, user_comments_map)
+    return winners
+
+
+def _assign_winning_comment(
+    winner: RaffleEntry,
+    user_comments_map: Optional[Dict[str, str]]
+) -> None:
+    """Set winning comment text on the winner if available."""
+    if not user_comments_map:
+        return
+    lookup_key = winner.user_id if winner.user_id else winner.username
+    comment = user_comments_map.get(lookup_key)
+    if comment is not None:
+        winner.comment_text = comment
@@ -1,4 +1,5 @@
 import re
+from datetime import datetime, timezone
 from urllib.parse import urlparse, parse_qs
 
 
@@ -105,3 +106,24 @@ def is_channel_url(url: str) -> bool:
             return True
     
     return False
+
+
+def parse_youtube_timestamp(value: str | None) -> datetime | None:
+    """
+    Parse an RFC 3339 timestamp from the YouTube API (e.g. snippet.publishedAt).
+    
+    Args:
+        value: Timestamp string such as "2024-05-01T18:22:03.123456Z"
+        
+    Returns:
+        Naive UTC datetime (matching the DB's DateTime columns), or None if missing/invalid
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed